@@ -2,39 +2,61 @@ import pandas as pd
 import numpy as np
 from OracleStrategy import BaselineStrategy
 import math
+import copy
 import matplotlib.pyplot as plt
 from tech_ind import simple_moving_average
-from tech_ind import bollinger_bands
 from tech_ind import relative_strength_index
-from backtester import assess_strategy
+from backtester import assess_strategy, verdict_to_trades
 from tech_ind import macd
+from tech_ind import MACDStream, RSIStream
+from plotting import plot_strategy, finish
+from data_store import get_data
+from indicator_cache import get_indicator
+from instrument import timed, stage
 
+DEFAULT_PARAMS = {'signal_line': 2.3, 'rsi_upper': 87, 'rsi_lower': 32, 'bb_window': 9, 'bb_std': 3}
+# The parameters the verdict actually depends on. bb_window/bb_std are accepted for compatibility,
+# but Bollinger bands take no part in any decision, so sweeping them only multiplies the grid.
+DECISION_PARAMS = ('signal_line', 'rsi_upper', 'rsi_lower')
 
 
-def get_data(start, end, symbols, column_name="Adj Close", include_spy=True, data_folder="./data"):
-    dates = pd.date_range(start, end)
-    df1 = pd.DataFrame(index=dates)
-    df2 = pd.read_csv('data/SPY.csv', index_col='Date', parse_dates=True, usecols=['Date', column_name])
-    df2.rename(columns={column_name: "SPY"}, inplace=True)
-    df1 = df1.join(df2, how='inner')
-    for symbol in symbols:
-        tmp_df = pd.read_csv(data_folder + '/'+ symbol + ".csv", index_col='Date', parse_dates=True, usecols=['Date', column_name])
-        tmp_df.rename(columns={column_name: symbol}, inplace=True)
-        df1 = df1.join(tmp_df, how='left', rsuffix='_'+symbol)
-    if (not include_spy):
-        df1.drop('SPY', axis=1, inplace=True)
-    return df1
+def macd_decisions(macd_values, signal_line):
+    # 1 when the MACD crosses above the signal line, -1 when it crosses below, 0 otherwise.
+    # The first day has no previous value and is left undecided (NaN).
+    prev_macd = macd_values[:-1]
+    curr_macd = macd_values[1:]
+    decisions = np.empty(len(macd_values))
+    decisions[:1] = np.nan
+    decisions[1:] = np.where((prev_macd < signal_line) & (curr_macd > signal_line), 1,
+                             np.where((prev_macd > signal_line) & (curr_macd < signal_line), -1, 0))
+    return decisions
 
 
-class TechnicalStrategy:
-    def __init__(self, *params, **kwparams):
-        # Defined so you can call it with any parameters and it will just do nothing.
-        pass
+def rsi_decisions(rsi_values, rsi_upper, rsi_lower):
+    # Overbought -> SHORT, oversold -> LONG; NaN RSI counts as neither.
+    return np.where(rsi_values > rsi_upper, -1.0, np.where(rsi_values < rsi_lower, 1.0, 0.0))
 
-    def train(self, *params, **kwparams):
-        # Defined so you can call it with any parameters and it will just do nothing.
-        pass
 
+class TechnicalStrategy:
+    def __init__(self, *params, **kwparams):
+        # Indicator thresholds; anything not in DEFAULT_PARAMS is ignored.
+        self.params = dict(DEFAULT_PARAMS)
+        self.params.update({k: v for k, v in kwparams.items() if k in DEFAULT_PARAMS})
+        # opt-in: read indicator series from the on-disk cache instead of recomputing them on every test
+        self.indicator_cache = kwparams.get('indicator_cache', False)
+
+    def train(self, start_date = '2018-01-01', end_date = '2019-12-31', symbol = 'DIS', starting_cash = 200000,
+              space = None, metric = 'sharpe', max_workers = None, **kwparams):
+        # Without a search space this does nothing. With one, sweep it in-sample and keep the best parameters.
+        if space is None:
+            return self.params
+        from sweep import sweep
+        ranked, results = sweep(space, [symbol], [(start_date, end_date)], metric=metric,
+                                starting_value=starting_cash, max_workers=max_workers, **kwparams)
+        self.params.update({k: ranked[k].iloc[0] for k in space})
+        return self.params
+
+    @timed('TechnicalStrategy.test')
     def test(self, start_date = '2018-01-01', end_date = '2019-12-31', symbol = 'DIS', starting_cash = 200000):
         # Inputs represent the date range to consider, the single stock to trade, and the starting portfolio value.
         #
@@ -42,78 +64,95 @@ class TechnicalStrategy:
         # Given the position limits, the only possible values are -2000, -1000, 0, 1000, 2000.
 
         data = get_data(start_date, end_date, [symbol], include_spy=False)
-        df_trades = pd.DataFrame(index=data.index, columns=['Trade'])
-        df_decisions = pd.DataFrame(index=data.index, columns=['MACD', 'RSI', 'Bollinger']) # fill with short or long strings
 
         # LONG = 1
         # GO_FLAT = 0
         # SHORT = -1
 
-        bollinger_data = bollinger_bands(data[symbol], window=9, num_std=3)
-        rsi_data = relative_strength_index(data)
-        macd_data = macd(data)
-
-        
-        prev_macd = None
-        signal_line = 2.3
-        for date, row in macd_data.iterrows():
-            curr_macd = macd_data.loc[date, 'MACD']
-            if prev_macd == None:
-                prev_macd = curr_macd
-                continue
-            # when the macd cross the zero line from negative to positive, SELL
-            if prev_macd < signal_line and curr_macd > signal_line: 
-                df_decisions.loc[date,'MACD'] = 1
-            elif prev_macd > signal_line and curr_macd < signal_line: # SELL
-                df_decisions.loc[date,'MACD'] = -1
-            else:
-                df_decisions.loc[date,'MACD'] = 0
-            prev_macd = curr_macd
-        
-
-        for date, row in rsi_data.iterrows():
-            if row['DIS'] > 87:
-                df_decisions.loc[date,'RSI'] = -1
-            elif row['DIS'] < 32:
-                df_decisions.loc[date,'RSI'] = 1
+        with stage('TechnicalStrategy.test:indicators'):
+            if self.indicator_cache:
+                rsi_values = get_indicator(symbol, 'rsi', start_date, end_date)['RSI']
+                macd_values = get_indicator(symbol, 'macd', start_date, end_date)['MACD']
             else:
-                df_decisions.loc[date,'RSI'] = 0
-
-
-
-        # go through each indicator separately and make an array for what they would do i.e long, short, nothing
-        # then can loop through all of these and figure out final decision off of aggregate of what the indicators suggest
-        long_positions = []
-        short_positions = []
-        shares_held = 0
-        for date,row in df_decisions.iterrows():
-            verdict = row['MACD'] + row['RSI'] 
-            if verdict > 0: # LONG
-                if shares_held > 0:
-                    df_trades.loc[date] = 0
-                elif shares_held == 0:
-                    df_trades.loc[date] = 1000
-                    long_positions.append(date)
-                elif shares_held < 0:
-                    df_trades.loc[date] = 2000
-                    long_positions.append(date)
-                shares_held = 1000
-            elif verdict < 0: # SHORT
-                if shares_held > 0:
-                    df_trades.loc[date] = -2000
-                    short_positions.append(date)
-                elif shares_held == 0:
-                    df_trades.loc[date] = -1000
-                    short_positions.append(date)
-                elif shares_held < 0:
-                    df_trades.loc[date] = 0
-                shares_held = -1000
-            else:
-                df_trades.loc[date] = 0
+                rsi_values = relative_strength_index(data)[symbol]
+                macd_values = macd(data, symbol)['MACD']
+
+        with stage('TechnicalStrategy.test:signals'):
+            df_decisions = pd.DataFrame({
+                'MACD': macd_decisions(macd_values.to_numpy(), self.params['signal_line']),
+                'RSI': rsi_decisions(rsi_values.to_numpy(), self.params['rsi_upper'], self.params['rsi_lower']),
+                'Bollinger': np.nan,
+            }, index=data.index)
+
+        # aggregate what the indicators suggest into a single verdict per day, then walk the position limits
+        with stage('TechnicalStrategy.test:positions'):
+            verdict = (df_decisions['MACD'] + df_decisions['RSI']).to_numpy()
+            trades = verdict_to_trades(verdict)
+            df_trades = pd.DataFrame({'Trade': trades}, index=data.index)
+            long_positions = data.index[trades > 0].tolist()
+            short_positions = data.index[trades < 0].tolist()
 
         return df_trades, long_positions, short_positions
-    
-def main():
+
+
+class StreamingTechnicalStrategy:
+    # Bar-by-bar version of TechnicalStrategy.test for live data: feed one price per trading day
+    # to update() and get back that day's Trade. Replaying a window from its first day produces
+    # the same trades as test() on that window.
+    def __init__(self, *params, **kwparams):
+        self.params = dict(DEFAULT_PARAMS)
+        self.params.update({k: v for k, v in kwparams.items() if k in DEFAULT_PARAMS})
+        self.macd = MACDStream()
+        self.rsi = RSIStream()
+        self.prev_macd = None
+        self.shares_held = 0
+
+    def update(self, price):
+        curr_macd = self.macd.update(price)
+        curr_rsi = self.rsi.update(price)
+        signal_line = self.params['signal_line']
+        if self.prev_macd is None:
+            macd_decision = float('nan')
+        elif self.prev_macd < signal_line and curr_macd > signal_line:
+            macd_decision = 1
+        elif self.prev_macd > signal_line and curr_macd < signal_line:
+            macd_decision = -1
+        else:
+            macd_decision = 0
+        self.prev_macd = curr_macd
+
+        if curr_rsi > self.params['rsi_upper']:
+            rsi_decision = -1
+        elif curr_rsi < self.params['rsi_lower']:
+            rsi_decision = 1
+        else:
+            rsi_decision = 0
+
+        verdict = macd_decision + rsi_decision
+        if verdict > 0:
+            target = 1000
+        elif verdict < 0:
+            target = -1000
+        else:
+            target = self.shares_held
+        trade = target - self.shares_held
+        self.shares_held = target
+        return trade
+
+    def run(self, prices):
+        # Feed a date-indexed price Series bar by bar; returns a Trade frame like test().
+        return pd.DataFrame({'Trade': [self.update(price) for price in prices.to_numpy()]}, index=prices.index)
+
+    def snapshot(self):
+        return copy.deepcopy(self.__dict__)
+
+    def restore(self, state):
+        self.__dict__.update(copy.deepcopy(state))
+        return self
+
+
+def main(out_folder=None):
+    # out_folder writes the chart there as a PNG instead of opening a window
     tech = TechnicalStrategy()
     # tech_strategy, long_pos, short_pos = tech.test()
     oos_tech_strat, long_pos, short_pos = tech.test(start_date='2020-01-01', end_date='2021-12-31')
@@ -122,18 +161,9 @@ def main():
     # baseline_strategy = baseline.test()
     baseline_strategy = baseline.test(start_date='2020-01-01', end_date='2021-12-31')
     b_ADR, b_CR, b_SD, b_DCR = assess_strategy(baseline_strategy, starting_value=200000)
-    plt.figure(figsize=(10, 6))
-    plt.plot(o_DCR, label='My Strategy', color='blue')
-    plt.plot(b_DCR, label='Baseline Strategy', color='orange')
-    for date in long_pos:
-        plt.axvline(x=date, color='green', linestyle='--', linewidth=1)
-    for date in short_pos:
-        plt.axvline(x=date, color='red', linestyle='--', linewidth=1)
-    plt.xlabel('Date')
-    plt.ylabel('Cumulative Returns')
-    plt.title('My Strategy vs Baseline Strategy - Cumulative Returns')
-    plt.legend()
-    plt.show()
+    fig, ax = plt.subplots(figsize=(10, 6))
+    plot_strategy(ax, o_DCR, b_DCR, long_pos, short_pos, label='My Strategy')
+    finish(fig, 'TechnicalStrategy', out_folder)
     print("Cumulative return for the baseline strategy: ", b_CR)
     print("Cumulative return for the my strategy: ", o_CR)
     print("Average Daily Returns return for the baseline strategy: ", b_ADR)
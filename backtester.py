@@ -1,41 +1,154 @@
 import pandas as pd
 import math
 import numpy as np
+from data_store import get_data, lookup, Universe
+from instrument import timed
 ############### backtester code ##################
-def assess_strategy(trades, starting_value = 200000, fixed_cost = 9.95, floating_cost = 0.005):
-    symbol = 'DIS' # can only trade disney 
-    
-    dates = trades.index.tolist()
-    portfolio_value = []
-    df = get_data(dates[0], dates[-1], [symbol], column_name="Adj Close", data_folder="./data", include_spy=False)
-    
-    cash = starting_value
-    current_shares = 0
-    for index, row in trades.iterrows():
-        shares = row['Trade']
-        price = df.loc[index].values
-        stock_value = abs(shares * price)
-        if(not math.isnan(stock_value)):
-            if shares > 0:
-                fee = fixed_cost + (floating_cost * stock_value)
-                cash -= fee
-                cash -= stock_value
-                current_shares += shares
-                
-            if shares < 0:
-                fee = fixed_cost + (floating_cost * stock_value)
-                cash -= fee
-                cash += stock_value
-                current_shares += shares
-
-
-        portfolio_value.append(cash + (current_shares*price))
-
-    trade_df = pd.DataFrame(portfolio_value, index=dates)
-    trade_df.columns = ["Portfolio Price"]  
-
-
-    daily_portfolio_values = trade_df
+def verdict_to_trades(verdict, position_size = 1000):
+    # Position state machine shared by the strategies: a positive verdict moves to +position_size,
+    # a negative one to -position_size, anything else (0 or NaN) holds. Returns the trade per day,
+    # so the only possible values are 0, +-position_size and +-2*position_size.
+    # A 2-D verdict is treated as (days, symbols), each column walked independently.
+    verdict = np.asarray(verdict, dtype=np.float64)
+    target = np.where(verdict > 0, position_size, np.where(verdict < 0, -position_size, 0))
+    # forward fill the last target over the hold days, starting flat
+    days = np.arange(len(target)).reshape((-1,) + (1,) * (target.ndim - 1))
+    last = np.maximum.accumulate(np.where(target != 0, days, -1), axis=0)
+    held = np.where(last >= 0, np.take_along_axis(target, np.maximum(last, 0), axis=0), 0)
+    return np.diff(held, axis=0, prepend=0)
+
+
+@timed()
+def portfolio_values(shares, prices, starting_value = 200000, fixed_cost = 9.95, floating_cost = 0.005,
+                     gross_shares = None, order_counts = None):
+    # Vectorized replay of a trade matrix. shares and prices are (days, symbols) arrays.
+    # A trade is skipped (no fee, no position change) when it is zero or its value is NaN,
+    # exactly as the original per-row loop did. Cash is shared across all symbols.
+    # gross_shares/order_counts let netted order books charge one fee per original order.
+    shares = np.asarray(shares, dtype=np.float64)
+    prices = np.asarray(prices, dtype=np.float64)
+    if gross_shares is None:
+        gross_shares = np.abs(shares)
+        order_counts = (shares != 0)
+    stock_value = np.abs(shares * prices)
+    executed = ~np.isnan(stock_value) & (order_counts != 0)
+    executed_shares = np.where(executed, shares, 0.0)
+    fees = np.where(executed, (fixed_cost * order_counts) + (floating_cost * gross_shares * np.abs(prices)), 0.0)
+    cash_flow = np.where(executed, -np.sign(shares) * stock_value, 0.0) - fees
+    cash = starting_value + np.cumsum(cash_flow.sum(axis=1))
+    holdings = np.cumsum(executed_shares, axis=0)
+    # symbols with no position contribute nothing, even on days they have no price. This is the one
+    # deliberate difference from the original single-symbol loop, which valued a flat day without a
+    # price as cash + 0 * NaN = NaN; here that day is worth the cash, so one unpriced symbol in a
+    # multi-symbol book cannot blank out the whole portfolio.
+    position_values = np.where(holdings != 0, holdings * prices, 0.0)
+    return cash + position_values.sum(axis=1), holdings, cash
+
+
+def aggregate_orders(orders):
+    # Long-format orders (Date, Symbol, Direction, Shares) -> one row per (Date, Symbol) with net signed
+    # shares, gross shares and the number of orders, so fees can still be charged per order.
+    dates = pd.to_datetime(orders['Date'])
+    shares = orders['Shares'].astype(np.float64)
+    direction = orders['Direction'].str.strip().str.upper()
+    unknown = ~direction.isin(['BUY', 'SELL'])
+    if unknown.any():
+        raise ValueError("unknown order directions: " + ", ".join(sorted(orders['Direction'][unknown].astype(str).unique())))
+    sign = np.where(direction == 'SELL', -1.0, 1.0)
+    aggregated = pd.DataFrame({'Date': dates, 'Symbol': orders['Symbol'].str.strip(),
+                               'Net': sign * shares, 'Gross': shares.abs(), 'Count': 1})
+    return aggregated.groupby(['Date', 'Symbol'])[['Net', 'Gross', 'Count']].sum()
+
+
+def _order_matrices(aggregated, start_date = None, end_date = None):
+    order_dates = aggregated.index.get_level_values('Date')
+    if start_date is None:
+        start_date = order_dates.min()
+    if end_date is None:
+        end_date = order_dates.max()
+    calendar = get_data(start_date, end_date, []).index
+    off_calendar = ~order_dates.isin(calendar)
+    if off_calendar.any():
+        raise ValueError("orders on non-trading dates: " + ", ".join(sorted(order_dates[off_calendar].strftime('%Y-%m-%d').unique())))
+    return [aggregated[col].unstack('Symbol').reindex(calendar).fillna(0) for col in ('Net', 'Gross', 'Count')]
+
+
+@timed()
+def orders_to_trades(orders, start_date = None, end_date = None):
+    # Long-format order book (Date, Symbol, Direction, Shares) -> wide date x symbol matrices of
+    # net signed shares, gross shares and order counts on the SPY trading calendar.
+    return _order_matrices(aggregate_orders(orders), start_date, end_date)
+
+
+@timed()
+def replay_orders(path, starting_value = 200000, fixed_cost = 9.95, floating_cost = 0.005,
+                  start_date = None, end_date = None, chunksize = 1000000, symbol_block = 256, out_path = None):
+    # Replays an order file in the trades/*.csv format of any size. The file is read in chunks that
+    # are netted per (date, symbol) as they arrive, so memory depends on the number of distinct
+    # trading days and symbols, never on the number of orders. The portfolio is valued symbol_block
+    # columns at a time, and only that block's prices are loaded, so price memory is bounded by
+    # days x symbol_block.
+    # Returns the daily portfolio values followed by the calculate_info statistics.
+    aggregated = None
+    for chunk in pd.read_csv(path, chunksize=chunksize, usecols=['Date', 'Symbol', 'Direction', 'Shares'],
+                             dtype={'Date': str, 'Symbol': str, 'Direction': str, 'Shares': np.float64}):
+        chunk_orders = aggregate_orders(chunk)
+        aggregated = chunk_orders if aggregated is None else pd.concat([aggregated, chunk_orders]).groupby(level=['Date', 'Symbol']).sum()
+    if aggregated is None:
+        raise ValueError("no orders in " + path)
+
+    net, gross, counts = _order_matrices(aggregated, start_date, end_date)
+    symbols = list(net.columns)
+    values = np.full(len(net), float(starting_value))
+    for first in range(0, len(symbols), symbol_block):
+        block = slice(first, first + symbol_block)
+        prices = Universe(symbols[block], net.index[0], net.index[-1])
+        block_values, holdings, cash = portfolio_values(net.iloc[:, block].to_numpy(), prices.matrix(), 0,
+                                                        fixed_cost, floating_cost, gross.iloc[:, block].to_numpy(),
+                                                        counts.iloc[:, block].to_numpy())
+        values += block_values
+
+    daily_portfolio_values = pd.DataFrame({"Portfolio Price": values}, index=net.index)
+    if out_path is not None:
+        daily_portfolio_values.to_csv(out_path, index_label='Date')
+    SR, ADR, CR, SD, final, DCR = calculate_info(daily_portfolio_values)
+    return daily_portfolio_values, SR, ADR, CR, SD, final
+
+
+@timed()
+def backtest_portfolio(trades, starting_value = 200000, fixed_cost = 9.95, floating_cost = 0.005,
+                       start_date = None, end_date = None):
+    # trades is either a long order book (with a 'Symbol' column) or a wide date x symbol matrix
+    # of signed share trades. All prices are loaded in one aligned get_data call.
+    # Returns the daily portfolio value frame, per-symbol holdings, per-symbol position values and cash.
+    if 'Symbol' in trades.columns:
+        trades, gross, counts = orders_to_trades(trades, start_date, end_date)
+        gross, counts = gross.to_numpy(), counts.to_numpy()
+    else:
+        gross = counts = None
+    symbols = list(trades.columns)
+    dates = trades.index
+    df = get_data(dates[0], dates[-1], [sym for sym in symbols if sym != 'SPY'], column_name="Adj Close", data_folder="./data", include_spy=True)
+    prices = df.loc[dates, symbols].to_numpy()
+    shares = trades.to_numpy(dtype=np.float64)
+
+    values, holdings, cash = portfolio_values(shares, prices, starting_value, fixed_cost, floating_cost, gross, counts)
+
+    daily_portfolio_values = pd.DataFrame({"Portfolio Price": values}, index=dates)
+    holdings_df = pd.DataFrame(holdings, index=dates, columns=symbols)
+    position_values_df = pd.DataFrame(np.where(holdings != 0, holdings * prices, 0.0), index=dates, columns=symbols)
+    cash_series = pd.Series(cash, index=dates, name="Cash")
+    return daily_portfolio_values, holdings_df, position_values_df, cash_series
+
+
+@timed()
+def assess_strategy(trades, starting_value = 200000, fixed_cost = 9.95, floating_cost = 0.005, symbol = 'DIS'):
+    # A single 'Trade' column trades `symbol` (Disney by default); any other frame is treated
+    # as a multi-symbol trade matrix or order book and backtested with shared cash.
+    if list(trades.columns) == ['Trade']:
+        trades = trades.rename(columns={'Trade': symbol})
+
+    daily_portfolio_values, holdings, position_values, cash = backtest_portfolio(trades, starting_value, fixed_cost, floating_cost)
 
     SR, ADR, CR, SD, final, DCR = calculate_info(daily_portfolio_values)
 
@@ -44,13 +157,10 @@ def assess_strategy(trades, starting_value = 200000, fixed_cost = 9.95, floating
 
 
 def get_adj_close(date, symbol, column_name="Adj Close", data_folder="./data"):
-    df = pd.read_csv('Data/' + symbol + '.csv')
-    row = df[df['Date'].str.strip() == date.date().strftime('%Y-%m-%d')]
-    if row.empty:
-        return 0 
-    adj_close = row[column_name].values[0]
-    return adj_close
+    # 0 when the symbol did not trade on that date, as before
+    return lookup(symbol, date, column_name, missing=0, data_folder=data_folder)
 
+@timed()
 def calculate_info(daily_prices_df, risk_free_rate=0, sample_freq=252):
     # Multiply each column by the allocation to that stock
     cumulative_return = (daily_prices_df.iloc[-1] / daily_prices_df.iloc[0]) - 1
@@ -65,43 +175,48 @@ def calculate_info(daily_prices_df, risk_free_rate=0, sample_freq=252):
     end_value = daily_prices_df.iloc[-1]
     return sharpe_ratio.values[0], average_daily_return.values[0], cumulative_return.values[0], stdev_daily_return.values[0], end_value.values[0], daily_cumulative_returns
 
-def get_data(start, end, symbols, column_name="Adj Close", include_spy=True, data_folder="./data"):
-    dates = pd.date_range(start, end)
-    df1 = pd.DataFrame(index=dates)
-    df2 = pd.read_csv('data/SPY.csv', index_col='Date', parse_dates=True, usecols=['Date', column_name])
-    df2.rename(columns={column_name: "SPY"}, inplace=True)
-    df1 = df1.join(df2, how='inner')
-    for symbol in symbols:
-        tmp_df = pd.read_csv(data_folder + '/'+ symbol + ".csv", index_col='Date', parse_dates=True, usecols=['Date', column_name])
-        tmp_df.rename(columns={column_name: symbol}, inplace=True)
-        df1 = df1.join(tmp_df, how='left', rsuffix='_'+symbol)
-    if (not include_spy):
-        df1.drop('SPY', axis=1, inplace=True)
-    return df1
+@timed()
+def calculate_info_many(daily_values, risk_free_rate=0, sample_freq=252):
+    # calculate_info for many portfolios at once: one column per portfolio (DataFrame or (days, portfolios)
+    # array). Returns one row per portfolio. Like pct_change(), a missing value is forward-filled before
+    # the returns are taken (a zero return that day, the jump lands on the next valued day); returns
+    # that are still NaN (leading NaNs) are skipped per column like dropna() would.
+    columns = daily_values.columns if isinstance(daily_values, pd.DataFrame) else None
+    values = np.asarray(daily_values, dtype=np.float64)
+    filled = pd.DataFrame(values).ffill().to_numpy()
+    daily_returns = filled[1:] / filled[:-1] - 1
+    excess_daily_returns = daily_returns - risk_free_rate
+    return pd.DataFrame({
+        'sharpe_ratio': (np.nanmean(excess_daily_returns, axis=0) / np.nanstd(excess_daily_returns, axis=0, ddof=1)) * math.sqrt(sample_freq),
+        'average_daily_return': np.nanmean(daily_returns, axis=0),
+        'cumulative_return': (values[-1] / values[0]) - 1,
+        'stdev_daily_return': np.nanstd(daily_returns, axis=0, ddof=1),
+        'end_value': values[-1],
+    }, index=columns)
+
 
+@timed()
+def assess_portfolios(start_date, end_date, symbols, allocations,
+                      starting_value=1000000, risk_free_rate=0.0,
+                      sample_freq=252, prices=None):
+    # allocations is a (portfolios, symbols) matrix. Prices are loaded and normalized once and every
+    # portfolio's daily value comes out of a single matrix multiply. Pass prices (a date x symbol
+    # frame, e.g. from a previous call or a Universe) to skip loading entirely.
+    if prices is None:
+        prices = get_data(start_date, end_date, symbols, include_spy=False)
+    price_matrix = prices.to_numpy(dtype=np.float64)
+    # Normalize stock prices to the first day; symbols without a price add nothing that day
+    normalized_prices = np.nan_to_num(price_matrix / price_matrix[0])
+    allocations = np.atleast_2d(np.asarray(allocations, dtype=np.float64))
+    daily_portfolio_values = (normalized_prices @ allocations.T) * starting_value
+    return calculate_info_many(pd.DataFrame(daily_portfolio_values, index=prices.index), risk_free_rate, sample_freq)
+
+
+@timed()
 def assess_portfolio (start_date, end_date, symbols, allocations,
                       starting_value=1000000, risk_free_rate=0.0,
                       sample_freq=252, plot_returns=True):
-    daily_prices_df = get_data(start_date, end_date, symbols)
-    # Normalize stock prices to the first day
-    normalized_prices = daily_prices_df / daily_prices_df.iloc[0]
-    # Multiply each column by the allocation to that stock
-    allocated_prices = normalized_prices.iloc[:, 1:] * allocations
-    # Multiply normalized allocations by starting portfolio dollar value
-    portfolio_values = allocated_prices * starting_value
-    # Sum each date (across the stocks) to get daily portfolio dollar value
-    daily_portfolio_value = portfolio_values.sum(axis=1)
-    cumulative_return = (daily_portfolio_value.iloc[-1] / daily_portfolio_value.iloc[0]) - 1
-    # pct_change() --> Fractional change between the current and a prior element
-    daily_returns = daily_portfolio_value.pct_change().dropna()
-    average_daily_return = daily_returns.mean()
-    stdev_daily_return = daily_returns.std()
-    # Calculate Sharpe Ratio
-    excess_daily_returns = daily_returns - risk_free_rate
-    sharpe_ratio = (excess_daily_returns.mean() / excess_daily_returns.std()) * math.sqrt(sample_freq)
-    end_value = daily_portfolio_value.iloc[-1]
-
-
-    return sharpe_ratio, average_daily_return, cumulative_return, stdev_daily_return, end_value 
+    info = assess_portfolios(start_date, end_date, symbols, [allocations], starting_value, risk_free_rate, sample_freq).iloc[0]
+    return info['sharpe_ratio'], info['average_daily_return'], info['cumulative_return'], info['stdev_daily_return'], info['end_value']
 
 ###########################################################
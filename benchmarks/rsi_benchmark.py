@@ -0,0 +1,58 @@
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from data_store import get_data
+from tech_ind import relative_strength_index
+
+############### RSI benchmark ##################
+# Compares the vectorized Wilder smoothing in tech_ind against the original per-row loop
+# on the longest histories in data/. Run from the repository root:
+#   python benchmarks/rsi_benchmark.py
+
+
+def relative_strength_index_loop(data):
+    # The original implementation, kept here only as the reference for timing and equivalence.
+    price_diff = data.diff(1)
+    gain = price_diff.where(price_diff > 0, 0)
+    loss = -price_diff.where(price_diff < 0, 0)
+
+    avg_gain = gain.rolling(window=14).mean()
+    avg_loss = loss.rolling(window=14).mean()
+
+    for i in range(14, len(avg_gain)):
+        avg_gain.iloc[i] = (avg_gain.iloc[i - 1] * 13 + gain.iloc[i]) / 14
+        avg_loss.iloc[i] = (avg_loss.iloc[i - 1] * 13 + loss.iloc[i]) / 14
+
+    rs_smoothed = avg_gain / avg_loss
+    return 100 - (100 / (1 + rs_smoothed))
+
+
+def best_of(func, data, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(data)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main(symbols=('XRX', 'HPQ'), repeat=3):
+    for symbol in symbols:
+        data = get_data('1900-01-01', '2100-01-01', [symbol], include_spy=False)
+        loop_time, expected = best_of(relative_strength_index_loop, data, 1)
+        fast_time, actual = best_of(relative_strength_index, data, repeat)
+        max_diff = np.nanmax(np.abs(expected.values - actual.values))
+        print(f"{symbol}: {len(data)} rows  loop {loop_time * 1000:.1f} ms  vectorized {fast_time * 1000:.2f} ms  "
+              f"speedup {loop_time / fast_time:.0f}x  max abs diff {max_diff:.2e}")
+
+    universe = ['XRX', 'HPQ', 'DIS', 'IBM', 'GE', 'KO']
+    data = get_data('1900-01-01', '2100-01-01', universe, include_spy=False)
+    fast_time, _ = best_of(relative_strength_index, data, repeat)
+    print(f"{len(universe)} symbols in one call: {fast_time * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
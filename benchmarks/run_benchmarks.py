@@ -0,0 +1,154 @@
+import os
+import sys
+import gc
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import data_store
+from data_store import get_data
+from tech_ind import simple_moving_average, bollinger_bands, relative_strength_index, macd
+from TechnicalStrategy import TechnicalStrategy
+from OracleStrategy import OracleStrategy
+from backtester import assess_strategy
+
+############### benchmark suite ##################
+# Times every stage of the pipeline and records peak traced memory, then compares against a
+# stored baseline. Run from the repository root:
+#   python benchmarks/run_benchmarks.py --save-baseline     # record the current numbers
+#   python benchmarks/run_benchmarks.py                     # compare, exit 1 on regression
+#   python benchmarks/run_benchmarks.py -k tech_ind         # only cases whose name contains tech_ind
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+SHORT_SYMBOL = 'ACI'    # ~400 rows
+LONG_SYMBOL = 'XRX'     # listed before SPY, so the full ~7,300-day calendar
+
+
+def _universe(n):
+    symbols = sorted(f[:-4] for f in os.listdir('./data') if f.endswith('.csv') and f != 'SPY.csv')
+    return symbols[:n]
+
+
+def _get_data_cold(symbols):
+    # empty the in-process price cache first so the memory-mapped store has to be read
+    data_store.price_cache.clear()
+    return get_data('2000-01-01', '2020-12-31', symbols)
+
+
+def _history(symbol):
+    # the symbol's own listed span on the SPY calendar
+    dates, values, fields = data_store.load_symbol(symbol)
+    return get_data(str(dates[0]), str(dates[-1]), [symbol], include_spy=False)
+
+
+# name -> (setup returning the argument, function taking it)
+CASES = {}
+
+
+def case(name, setup=lambda: None):
+    def register(func):
+        CASES[name] = (setup, func)
+        return func
+    return register
+
+
+for n, label in ((1, 'small'), (500, 'large')):
+    setup = lambda n=n: _universe(n)
+    case(f'get_data[{label}, cold]', setup)(_get_data_cold)
+    case(f'get_data[{label}, warm]', setup)(lambda symbols: get_data('2000-01-01', '2020-12-31', symbols))
+
+for symbol, label in ((SHORT_SYMBOL, 'short'), (LONG_SYMBOL, 'long')):
+    setup = lambda symbol=symbol: _history(symbol)[symbol]
+    case(f'tech_ind.simple_moving_average[{label}]', setup)(lambda prices: simple_moving_average(prices, window=20))
+    case(f'tech_ind.bollinger_bands[{label}]', setup)(lambda prices: bollinger_bands(prices, window=9, num_std=2))
+    case(f'tech_ind.relative_strength_index[{label}]', setup)(lambda prices: relative_strength_index(prices))
+    case(f'tech_ind.macd[{label}]', lambda symbol=symbol: _history(symbol))(lambda data, symbol=symbol: macd(data, symbol))
+
+case('TechnicalStrategy.test[2y]')(lambda _: TechnicalStrategy().test('2018-01-01', '2019-12-31'))
+case('TechnicalStrategy.test[20y]')(lambda _: TechnicalStrategy().test('2001-01-01', '2020-12-31'))
+case('TechnicalStrategy.test[20y, indicator cache]')(lambda _: TechnicalStrategy(indicator_cache=True).test('2001-01-01', '2020-12-31'))
+case('OracleStrategy.test[2y]')(lambda _: OracleStrategy().test('2018-01-01', '2019-12-31'))
+case('OracleStrategy.test[20y]')(lambda _: OracleStrategy().test('2001-01-01', '2020-12-31'))
+case('assess_strategy[2y]', lambda: TechnicalStrategy().test('2018-01-01', '2019-12-31')[0])(lambda trades: assess_strategy(trades))
+case('assess_strategy[20y]', lambda: OracleStrategy().test('2001-01-01', '2020-12-31'))(lambda trades: assess_strategy(trades))
+
+
+def measure(setup, func, repeat):
+    arg = setup()
+    func(arg)  # warm-up, also builds any on-disk caches
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func(arg)
+        times.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    func(arg)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'min_s': min(times), 'median_s': sorted(times)[len(times) // 2], 'peak_bytes': peak}
+
+
+def compare(results, baseline, tolerance):
+    # A case regresses when its best time or peak memory exceeds the baseline by more than tolerance.
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for key in ('min_s', 'peak_bytes'):
+            old = baseline[name][key]
+            if old > 0 and result[key] > old * (1 + tolerance):
+                regressions.append((name, key, old, result[key]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark data loading, indicators, strategies and the backtester.")
+    parser.add_argument('-k', dest='keyword', default='', help="only run cases whose name contains this text")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown before a case counts as a regression")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help="write these results as the new baseline")
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, (setup, func) in CASES.items():
+        if args.keyword not in name:
+            continue
+        results[name] = measure(setup, func, args.repeat)
+        print(f"{name:<50} {results[name]['min_s'] * 1000:10.2f} ms  {results[name]['peak_bytes'] / 2**20:8.2f} MB")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f).get('results', {})
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump({'machine': platform.platform(), 'python': platform.python_version(), 'results': baseline}, f, indent=2)
+        print("baseline written to", args.baseline)
+        return 0
+    if not os.path.exists(args.baseline):
+        print("no baseline at", args.baseline, "- run with --save-baseline first")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    regressions = compare(results, baseline, args.tolerance)
+    for name, key, old, new in regressions:
+        print(f"REGRESSION {name} {key}: {old:.6g} -> {new:.6g} ({new / old - 1:+.0%})")
+    if not regressions:
+        print(f"no regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,301 @@
+import os
+import json
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from instrument import timed
+
+############### columnar price store ##################
+# Each data/<symbol>.csv is converted once into two memory-mapped NumPy files:
+#   <symbol>.dates.npy   datetime64[D], sorted ascending
+#   <symbol>.values.npy  float64, shape (n_fields, n_days) so each field is contiguous
+# plus <symbol>.json recording the field names and the source CSV mtime.
+# A symbol is rebuilt only when its CSV mtime no longer matches the recorded one.
+
+STORE_FOLDER = "./cache/prices"
+
+
+def _store_paths(symbol, store_folder):
+    base = os.path.join(store_folder, symbol)
+    return base + ".dates.npy", base + ".values.npy", base + ".json"
+
+
+def build_symbol(symbol, data_folder="./data", store_folder=STORE_FOLDER):
+    csv_path = os.path.join(data_folder, symbol + ".csv")
+    mtime = os.stat(csv_path).st_mtime_ns
+    df = pd.read_csv(csv_path, index_col='Date', parse_dates=True)
+    return write_symbol(symbol, df, mtime, store_folder)
+
+
+def write_symbol(symbol, df, mtime_ns, store_folder=STORE_FOLDER):
+    # Store a Date-indexed frame as the symbol's arrays, recording mtime_ns of the CSV it stands for.
+    dates_path, values_path, meta_path = _store_paths(symbol, store_folder)
+    os.makedirs(store_folder, exist_ok=True)
+    # searchsorted everywhere relies on strictly ascending dates: sort (stable) and keep the last
+    # row of a duplicated date, the same normalization ingest.validate_prices applies
+    if not (df.index.is_monotonic_increasing and df.index.is_unique):
+        df = df.iloc[np.argsort(df.index.values, kind='stable')]
+        df = df[~df.index.duplicated(keep='last')]
+    fields = list(df.columns)
+    dates = df.index.values.astype('datetime64[D]')
+    values = np.ascontiguousarray(df.to_numpy(dtype=np.float64).T)
+
+    # write to temporaries and rename so a concurrent reader never sees a half-written file
+    suffix = f".{os.getpid()}.tmp"
+    for path, arr in ((dates_path, dates), (values_path, values)):
+        with open(path + suffix, "wb") as f:
+            np.save(f, arr)
+        os.replace(path + suffix, path)
+    with open(meta_path + suffix, "w") as f:
+        json.dump({"fields": fields, "mtime_ns": mtime_ns, "rows": len(dates)}, f)
+    os.replace(meta_path + suffix, meta_path)
+    return dates, values, fields
+
+
+def is_stale(symbol, data_folder="./data", store_folder=STORE_FOLDER):
+    dates_path, values_path, meta_path = _store_paths(symbol, store_folder)
+    if not (os.path.exists(dates_path) and os.path.exists(values_path) and os.path.exists(meta_path)):
+        return True
+    with open(meta_path) as f:
+        meta = json.load(f)
+    return meta["mtime_ns"] != os.stat(os.path.join(data_folder, symbol + ".csv")).st_mtime_ns
+
+
+def load_symbol(symbol, data_folder="./data", store_folder=STORE_FOLDER):
+    # Returns (dates, values, fields); dates and values are read-only memory maps.
+    if is_stale(symbol, data_folder, store_folder):
+        build_symbol(symbol, data_folder, store_folder)
+    dates_path, values_path, meta_path = _store_paths(symbol, store_folder)
+    with open(meta_path) as f:
+        fields = json.load(f)["fields"]
+    return np.load(dates_path, mmap_mode='r'), np.load(values_path, mmap_mode='r'), fields
+
+
+def build_store(symbols=None, data_folder="./data", store_folder=STORE_FOLDER):
+    # Convert every (or the given) CSV in data_folder; returns the symbols that were rebuilt.
+    if symbols is None:
+        symbols = sorted(f[:-4] for f in os.listdir(data_folder) if f.endswith(".csv"))
+    rebuilt = []
+    for symbol in symbols:
+        if is_stale(symbol, data_folder, store_folder):
+            build_symbol(symbol, data_folder, store_folder)
+            rebuilt.append(symbol)
+    return rebuilt
+
+
+def _to_day(date):
+    return np.datetime64(pd.Timestamp(date).normalize().date(), 'D')
+
+
+def read_range(symbol, start, end, column_name="Adj Close", data_folder="./data", store_folder=STORE_FOLDER):
+    # Zero-copy slice of one field between start and end (inclusive); returns (dates, values) views.
+    dates, values, fields = load_symbol(symbol, data_folder, store_folder)
+    lo = np.searchsorted(dates, _to_day(start), side='left')
+    hi = np.searchsorted(dates, _to_day(end), side='right')
+    return dates[lo:hi], values[fields.index(column_name), lo:hi]
+
+
+# symbol -> (CSV mtime, (dates, values, fields)) memory maps opened once per process for point lookups
+_open_symbols = {}
+
+
+def open_symbol(symbol, data_folder="./data", store_folder=STORE_FOLDER):
+    # One stat per call: a CSV whose mtime changed since it was opened is rebuilt and reopened,
+    # so lookups never serve prices from before a refresh.
+    key = (symbol, data_folder, store_folder)
+    mtime = os.stat(os.path.join(data_folder, symbol + ".csv")).st_mtime_ns
+    entry = _open_symbols.get(key)
+    if entry is None or entry[0] != mtime:
+        entry = _open_symbols[key] = (mtime, load_symbol(symbol, data_folder, store_folder))
+    return entry[1]
+
+
+def close_symbols():
+    # forget the open memory maps, e.g. after the store was rewritten without its CSV changing (ingest)
+    _open_symbols.clear()
+
+
+def lookup(symbol, date, column_name="Adj Close", missing=np.nan, data_folder="./data"):
+    # Price of symbol on one date by binary search over the stored date index; missing if not traded that day.
+    dates, values, fields = open_symbol(symbol, data_folder)
+    day = _to_day(date)
+    pos = np.searchsorted(dates, day)
+    if pos == len(dates) or dates[pos] != day:
+        return missing
+    return values[fields.index(column_name), pos]
+
+
+def lookup_many(symbols, dates, column_name="Adj Close", missing=np.nan, data_folder="./data"):
+    # Batch form of lookup for arrays of (symbol, date) pairs; returns a float array in input order.
+    symbols = np.asarray(symbols)
+    days = pd.to_datetime(np.asarray(dates)).values.astype('datetime64[D]')
+    out = np.full(len(symbols), missing, dtype=np.float64)
+    # group the pairs by symbol once (hash the names, sort the integer codes) instead of
+    # scanning the whole array once per symbol
+    inverse, unique_symbols = pd.factorize(symbols)
+    order = np.argsort(inverse, kind='stable')
+    bounds = np.cumsum(np.bincount(inverse, minlength=len(unique_symbols)))[:-1]
+    for symbol, rows in zip(unique_symbols, np.split(order, bounds)):
+        sym_dates, values, fields = open_symbol(symbol, data_folder)
+        if len(sym_dates) == 0:
+            continue
+        pos = np.minimum(np.searchsorted(sym_dates, days[rows]), len(sym_dates) - 1)
+        found = sym_dates[pos] == days[rows]
+        out[rows[found]] = values[fields.index(column_name), pos[found]]
+    return out
+
+
+class PriceCache:
+    # Process-wide LRU cache of (dates, values) arrays keyed by (symbol, column, data_folder).
+    # Each entry remembers the date range it was loaded for, so any request inside that range
+    # is served by slicing; a request outside it reloads the union of both ranges. Entries also
+    # record the CSV mtime they were loaded from, and a changed CSV makes the entry a miss.
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def read(self, symbol, start, end, column_name="Adj Close", data_folder="./data"):
+        key = (symbol, column_name, data_folder)
+        start_day, end_day = _to_day(start), _to_day(end)
+        mtime = os.stat(os.path.join(data_folder, symbol + ".csv")).st_mtime_ns
+        entry = self.entries.get(key)
+        if entry is not None and entry[4] != mtime:
+            # the CSV changed since this was loaded: none of it can be reused
+            self._remove(key)
+            entry = None
+        if entry is not None and entry[0] <= start_day and end_day <= entry[1]:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            dates, values = entry[2], entry[3]
+        else:
+            self.misses += 1
+            if entry is not None:
+                start_day, end_day = min(start_day, entry[0]), max(end_day, entry[1])
+                self._remove(key)
+            dates, values = read_range(symbol, start_day, end_day, column_name, data_folder)
+            dates, values = np.array(dates), np.array(values)
+            self.entries[key] = (start_day, end_day, dates, values, mtime)
+            self.nbytes += dates.nbytes + values.nbytes
+            self._evict(keep=key)
+        lo = np.searchsorted(dates, _to_day(start), side='left')
+        hi = np.searchsorted(dates, _to_day(end), side='right')
+        return dates[lo:hi], values[lo:hi]
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        self.nbytes -= entry[2].nbytes + entry[3].nbytes
+
+    def _evict(self, keep=None):
+        # drop least recently used entries until under the limit, never the one just loaded
+        while self.nbytes > self.max_bytes and len(self.entries) > 1:
+            oldest = next(iter(self.entries))
+            if oldest == keep:
+                break
+            self._remove(oldest)
+            self.evictions += 1
+
+    def set_limit(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._evict()
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "entries": len(self.entries), "bytes": self.nbytes, "max_bytes": self.max_bytes}
+
+
+# Shared by every get_data call in the process. Refreshed CSVs are picked up by their mtime; call
+# price_cache.clear() only if the store was rewritten without its CSV changing.
+price_cache = PriceCache()
+
+
+def preload(symbols, start, end, column_name="Adj Close", data_folder="./data"):
+    # Warm price_cache with the full span once (e.g. in a worker initializer) so that every later
+    # get_data call inside [start, end] is a slice of memory, never a disk read.
+    get_data(start, end, symbols, column_name, True, data_folder)
+
+
+def align(dates, values, target_dates, out=None):
+    # Place values onto target_dates (both sorted); dates missing from the source become NaN.
+    if out is None:
+        out = np.empty(len(target_dates))
+    if len(dates) == len(target_dates) and np.array_equal(dates, target_dates):
+        out[:] = values
+        return out
+    out[:] = np.nan
+    if len(dates) == 0:
+        return out
+    pos = np.minimum(np.searchsorted(dates, target_dates), len(dates) - 1)
+    found = dates[pos] == target_dates
+    out[found] = values[pos[found]]
+    return out
+
+
+class Universe:
+    # Aligned date x symbol price matrices for a whole universe on the SPY calendar.
+    # Each field (Open, High, Low, Close, Adj Close, Volume) is read from the store only when first
+    # requested, into one preallocated (symbols, days) array that is handed to pandas without a copy.
+    # dtype=np.float32 halves the memory; Volume above 2**24 then loses precision.
+    def __init__(self, symbols=None, start='1900-01-01', end='2100-12-31', dtype=np.float64,
+                 data_folder="./data", store_folder=STORE_FOLDER):
+        if symbols is None:
+            symbols = sorted(f[:-4] for f in os.listdir(data_folder) if f.endswith(".csv") and f != "SPY.csv")
+        self.symbols = list(symbols)
+        self.start, self.end = start, end
+        self.dtype = np.dtype(dtype)
+        self.data_folder = data_folder
+        self.store_folder = store_folder
+        self.dates, spy_values = read_range('SPY', start, end, "Adj Close", data_folder, store_folder)
+        self.dates = np.array(self.dates)
+        self.index = pd.DatetimeIndex(self.dates.astype('datetime64[ns]'))
+        self.fields = {}
+
+    def matrix(self, column_name="Adj Close"):
+        # (days, symbols) view of the field; loaded on first access
+        if column_name not in self.fields:
+            out = np.empty((len(self.symbols), len(self.dates)), dtype=self.dtype)
+            for row, symbol in enumerate(self.symbols):
+                sym_dates, sym_values = read_range(symbol, self.start, self.end, column_name, self.data_folder, self.store_folder)
+                align(sym_dates, sym_values, self.dates, out=out[row])
+            self.fields[column_name] = out
+        return self.fields[column_name].T
+
+    def frame(self, column_name="Adj Close"):
+        return pd.DataFrame(self.matrix(column_name), index=self.index, columns=self.symbols, copy=False)
+
+    def __getitem__(self, column_name):
+        return self.frame(column_name)
+
+    def drop(self, column_name):
+        self.fields.pop(column_name, None)
+
+    @property
+    def nbytes(self):
+        return sum(arr.nbytes for arr in self.fields.values())
+
+
+@timed()
+def get_data(start, end, symbols, column_name="Adj Close", include_spy=True, data_folder="./data"):
+    # SPY defines the trading calendar; every symbol is left-aligned onto it (NaN where missing).
+    # All columns are written into one preallocated (columns, days) block that pandas adopts as is.
+    spy_dates, spy_values = price_cache.read('SPY', start, end, column_name, data_folder)
+    names = ["SPY"]
+    for symbol in symbols:
+        names.append(symbol + '_' + symbol if symbol in names else symbol)
+    out = np.empty((len(names), len(spy_dates)))
+    out[0] = spy_values
+    for row, symbol in enumerate(symbols, start=1):
+        sym_dates, sym_values = price_cache.read(symbol, start, end, column_name, data_folder)
+        align(sym_dates, sym_values, spy_dates, out=out[row])
+    first = 0 if include_spy else 1
+    df = pd.DataFrame(out[first:].T, index=pd.DatetimeIndex(spy_dates.astype('datetime64[ns]')), columns=names[first:], copy=False)
+    return df
+
+###########################################################
@@ -0,0 +1,141 @@
+import os
+import pickle
+import hashlib
+import numpy as np
+import pandas as pd
+from data_store import get_data
+from instrument import timed
+from tech_ind import simple_moving_average, bollinger_bands, relative_strength_index, macd
+from tech_ind import SMAStream, BollingerStream, RSIStream, MACDStream
+
+############### indicator cache ##################
+# Indicator series are persisted under cache/indicators/<symbol>/ keyed by indicator name,
+# parameters and the first date they were computed from (EWM and Wilder averages depend on it).
+# The origin is normalised to the first trading day on or after start_date, so start dates that fall
+# on the same trading day share an entry. Each entry stores a fingerprint of the prices it was
+# computed from; the streaming indicator state after the last row is only built (by replaying the
+# prices once) the first time the entry has to be extended:
+#   - prices unchanged             -> served from disk
+#   - new rows appended to the CSV -> only the new rows are pushed through the saved stream state
+#   - any earlier row changed      -> recomputed from scratch
+
+CACHE_FOLDER = "./cache/indicators"
+
+# name -> (batch function returning a DataFrame, streaming factory, stream output -> row)
+INDICATORS = {
+    'sma': (lambda prices, window=20: simple_moving_average(prices, window=window).to_frame('SMA'),
+            lambda window=20: SMAStream(window), lambda value: (value,)),
+    'bollinger': (lambda prices, window=9, num_std=2: bollinger_bands(prices, window=window, num_std=num_std),
+                  lambda window=9, num_std=2: BollingerStream(window, num_std), lambda value: value),
+    'rsi': (lambda prices, period=14: relative_strength_index(prices, period=period).to_frame('RSI'),
+            lambda period=14: RSIStream(period), lambda value: (value,)),
+    'macd': (lambda prices: macd(prices.to_frame('price'), 'price')[['MACD']],
+             lambda: MACDStream(), lambda value: (value,)),
+}
+
+_loaded = {}
+
+
+def _entry_path(symbol, indicator, origin, params, cache_folder):
+    param_str = ",".join(f"{k}={params[k]}" for k in sorted(params))
+    name = f"{indicator}_{origin.strftime('%Y%m%d')}_{param_str}.pkl"
+    return os.path.join(cache_folder, symbol, name)
+
+
+def _fingerprint(prices, n):
+    digest = hashlib.sha1()
+    digest.update(prices.index.values[:n].tobytes())
+    digest.update(prices.to_numpy(dtype=np.float64)[:n].tobytes())
+    return digest.hexdigest()
+
+
+def _compute(prices, indicator, params):
+    batch, make_stream, to_row = INDICATORS[indicator]
+    frame = batch(prices, **params)
+    return {'columns': list(frame.columns), 'dates': prices.index.values, 'values': frame.to_numpy(),
+            'rows': len(prices), 'fingerprint': _fingerprint(prices, len(prices)), 'state': None}
+
+
+def _with_state(entry, prices, indicator, params):
+    # replay the entry's rows through the stream once to get the state appends continue from
+    if entry['state'] is not None:
+        return entry
+    batch, make_stream, to_row = INDICATORS[indicator]
+    stream = make_stream(**params)
+    for price in prices.to_numpy()[:entry['rows']]:
+        stream.update(price)
+    return dict(entry, state=stream.snapshot())
+
+
+def _extend(entry, prices, indicator, params):
+    batch, make_stream, to_row = INDICATORS[indicator]
+    stream = make_stream(**params).restore(_with_state(entry, prices, indicator, params)['state'])
+    new_prices = prices.iloc[entry['rows']:]
+    new_values = np.array([to_row(stream.update(price)) for price in new_prices.to_numpy()], dtype=np.float64)
+    return {'columns': entry['columns'], 'dates': prices.index.values,
+            'values': np.concatenate([entry['values'], new_values.reshape(len(new_prices), len(entry['columns']))]),
+            'rows': len(prices), 'fingerprint': _fingerprint(prices, len(prices)), 'state': stream.snapshot()}
+
+
+def _save(path, entry):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def _load(path):
+    if path in _loaded:
+        return _loaded[path]
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+@timed()
+def get_indicator(symbol, indicator, start_date, end_date, data_folder="./data", cache_folder=CACHE_FOLDER, **params):
+    # Returns the indicator computed on symbol's prices from start_date, sliced to [start_date, end_date].
+    # Same values as calling the tech_ind function on get_data(start_date, end_date, [symbol]).
+    if indicator not in INDICATORS:
+        raise ValueError("unknown indicator: " + indicator)
+    # every indicator is causal, so computing through the latest bar and slicing is equivalent
+    prices = get_data(start_date, '2100-12-31', [symbol], include_spy=False, data_folder=data_folder)[symbol]
+    origin = prices.index[0] if len(prices) else pd.Timestamp(start_date)
+    path = _entry_path(symbol, indicator, origin, params, cache_folder)
+
+    # trailing days without a price (symbol not refreshed yet) are served but not persisted,
+    # so filling them in later is an append rather than a change to cached rows
+    valid = np.flatnonzero(~np.isnan(prices.to_numpy()))
+    stable = prices.iloc[:valid[-1] + 1] if len(valid) else prices.iloc[:0]
+
+    entry = _load(path)
+    if entry is not None and entry['rows'] <= len(stable) and entry['fingerprint'] == _fingerprint(stable, entry['rows']):
+        if entry['rows'] < len(stable):
+            entry = _extend(entry, stable, indicator, params)
+            _save(path, entry)
+    else:
+        entry = _compute(stable, indicator, params)
+        _save(path, entry)
+    if len(stable) < len(prices) and entry['state'] is None:
+        entry = _with_state(entry, stable, indicator, params)
+        _save(path, entry)
+    _loaded[path] = entry
+    if len(stable) < len(prices):
+        entry = _extend(entry, prices, indicator, params)
+
+    frame = pd.DataFrame(entry['values'], index=pd.DatetimeIndex(entry['dates']), columns=entry['columns'])
+    return frame.loc[:pd.Timestamp(end_date)]
+
+
+def clear_cache(cache_folder=CACHE_FOLDER):
+    _loaded.clear()
+    if os.path.isdir(cache_folder):
+        for root, dirs, files in os.walk(cache_folder, topdown=False):
+            for name in files:
+                os.remove(os.path.join(root, name))
+            for name in dirs:
+                os.rmdir(os.path.join(root, name))
+
+###########################################################
@@ -0,0 +1,234 @@
+import os
+import io
+import re
+import sys
+import json
+import argparse
+import warnings
+import itertools
+import urllib.request
+from urllib.parse import urljoin, unquote
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import data_store
+from data_store import STORE_FOLDER, write_symbol, is_stale, load_symbol
+from instrument import timed
+
+############### ingestion pipeline ##################
+# Reads symbol files from a source, validates and normalizes them in a bounded process pool and writes
+# them to the price store that get_data reads. Only files whose source version changed since the last
+# run (or whose store entry is missing or stale) are processed.
+#   ingest()                                            # data/ itself: validate and (re)build the store
+#   ingest(HTTPSource("http://localhost:8000/"))        # refresh data/ from a server, e.g.
+#                                                       #   python -m http.server -d /path/to/feed 8000
+#   python ingest.py [--source DIR_OR_URL] [--workers N] [--force]
+#
+# Normalization sorts rows by date, keeps the last row of a duplicated date and coerces fields to
+# float (unparseable values become NaN). Gaps are trading days of the SPY calendar, inside the
+# symbol's own span, that have no row; they are reported, not filled.
+
+MANIFEST_PATH = "./cache/ingest/manifest.json"
+REQUIRED_COLUMNS = ['Date', 'Adj Close']
+ISSUES = ['bad_dates', 'non_monotonic', 'duplicates', 'missing_values', 'off_calendar', 'gaps']
+
+
+class LocalSource:
+    # <symbol>.csv files in a directory; a file's version is its size and modification time
+    def __init__(self, folder="./data"):
+        self.folder = folder
+
+    def symbols(self):
+        return sorted(f[:-4] for f in os.listdir(self.folder) if f.endswith(".csv"))
+
+    def version(self, symbol):
+        st = os.stat(os.path.join(self.folder, symbol + ".csv"))
+        return f"{st.st_size}:{st.st_mtime_ns}"
+
+    def read(self, symbol):
+        with open(os.path.join(self.folder, symbol + ".csv"), "rb") as f:
+            return f.read()
+
+
+class HTTPSource:
+    # <symbol>.csv files under base_url. Symbols come from the server's directory listing and a file's
+    # version from its Last-Modified, ETag and Content-Length headers.
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+        self.timeout = timeout
+
+    def symbols(self):
+        with urllib.request.urlopen(self.base_url, timeout=self.timeout) as response:
+            listing = response.read().decode("utf-8", "replace")
+        return sorted(set(unquote(name) for name in re.findall(r'href="([^"/?#]+)\.csv"', listing)))
+
+    def version(self, symbol):
+        request = urllib.request.Request(urljoin(self.base_url, symbol + ".csv"), method="HEAD")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return ":".join(response.headers.get(h, "") for h in ("Last-Modified", "ETag", "Content-Length"))
+
+    def read(self, symbol):
+        with urllib.request.urlopen(urljoin(self.base_url, symbol + ".csv"), timeout=self.timeout) as response:
+            return response.read()
+
+
+def validate_prices(raw, calendar=None):
+    # CSV bytes -> (normalized Date-indexed float frame, {issue: count}). calendar is the sorted
+    # datetime64[D] SPY dates used to find gaps (None skips those checks and reports them as None);
+    # raises ValueError when the file cannot be used at all.
+    df = pd.read_csv(io.BytesIO(raw))
+    missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError("missing columns: " + ", ".join(missing))
+    issues = dict.fromkeys(ISSUES, 0)
+    if calendar is None:
+        # not checked rather than zero
+        issues['off_calendar'] = issues['gaps'] = None
+
+    dates = pd.to_datetime(df.pop('Date'), errors='coerce')
+    bad = dates.isna().to_numpy()
+    issues['bad_dates'] = int(bad.sum())
+    df, dates = df[~bad], dates[~bad].to_numpy().astype('datetime64[D]')
+    issues['non_monotonic'] = int((dates[1:] < dates[:-1]).sum())
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    df = df.astype(np.float64)
+    df.index = pd.DatetimeIndex(dates.astype('datetime64[ns]'), name='Date')
+
+    # stable sort so that the last of several rows for a date is still the last one after sorting
+    df = df.iloc[np.argsort(dates, kind='stable')]
+    duplicated = df.index.duplicated(keep='last')
+    issues['duplicates'] = int(duplicated.sum())
+    df = df[~duplicated]
+    issues['missing_values'] = int(df.isna().any(axis=1).sum())
+
+    if calendar is not None and len(df):
+        days = df.index.values.astype('datetime64[D]')
+        # rows before SPY's first day (or after its last) cannot be checked
+        covered = days[(days >= calendar[0]) & (days <= calendar[-1])]
+        issues['off_calendar'] = int((~np.isin(covered, calendar)).sum())
+        span = calendar[(calendar >= days[0]) & (calendar <= days[-1])]
+        issues['gaps'] = int((~np.isin(span, days)).sum())
+    return df, issues
+
+
+def _write_csv(path, df):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    df.to_csv(tmp_path, index_label='Date')
+    os.replace(tmp_path, path)
+
+
+def _ingest_symbol(symbol, source, calendar, previous, data_folder, store_folder, in_place, force):
+    record = {'symbol': symbol, 'status': 'unchanged', 'rows': 0, 'version': None, 'error': None}
+    try:
+        version = record['version'] = source.version(symbol)
+        if (not force and previous is not None and previous['version'] == version
+                and not is_stale(symbol, data_folder, store_folder)):
+            return dict(previous, symbol=symbol, status='unchanged')
+        csv_path = os.path.join(data_folder, symbol + ".csv")
+        # stat before reading: if the file changes meanwhile the store is simply stale again
+        mtime = os.stat(csv_path).st_mtime_ns if in_place else None
+        df, issues = validate_prices(source.read(symbol), calendar)
+        if not in_place:
+            _write_csv(csv_path, df)
+            mtime = os.stat(csv_path).st_mtime_ns
+        write_symbol(symbol, df, mtime, store_folder)
+        record.update(issues, status='ingested', rows=len(df))
+    except Exception as e:
+        record.update(status='failed', error=f"{type(e).__name__}: {e}")
+    return record
+
+
+def _load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_manifest(path, manifest):
+    # a bare file name has no directory to create
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+
+@timed()
+def ingest(source=None, symbols=None, data_folder="./data", store_folder=STORE_FOLDER,
+           max_workers=None, force=False, manifest_path=MANIFEST_PATH):
+    # Returns one row per symbol: status ('ingested', 'unchanged' or 'failed'), rows, the issue counts
+    # and the error for failed files. A local source pointing at data_folder is validated in place:
+    # the CSVs are left untouched and only the store receives the normalized rows. Any other source
+    # also rewrites data_folder/<symbol>.csv with the normalized rows.
+    if source is None:
+        source = LocalSource(data_folder)
+    in_place = isinstance(source, LocalSource) and os.path.realpath(source.folder) == os.path.realpath(data_folder)
+    if not in_place:
+        os.makedirs(data_folder, exist_ok=True)
+    if symbols is None:
+        symbols = source.symbols()
+    manifest = _load_manifest(manifest_path)
+    settings = (data_folder, store_folder, in_place, force)
+
+    # SPY first: it defines the calendar the other symbols are checked against
+    records = []
+    if 'SPY' in symbols:
+        records.append(_ingest_symbol('SPY', source, None, manifest.get('SPY'), *settings))
+    try:
+        calendar = np.array(load_symbol('SPY', data_folder, store_folder)[0])
+    except (OSError, ValueError) as e:
+        warnings.warn(f"no SPY calendar in {data_folder} ({type(e).__name__}: {e}); "
+                      "gap and off-calendar checks are skipped")
+        calendar = None
+    others = [symbol for symbol in symbols if symbol != 'SPY']
+    tasks = (others, itertools.repeat(source), itertools.repeat(calendar), [manifest.get(symbol) for symbol in others],
+             *(itertools.repeat(value) for value in settings))
+    if max_workers == 1:
+        records += map(_ingest_symbol, *tasks)
+    else:
+        workers = max_workers or os.cpu_count() or 1
+        chunksize = max(1, len(others) // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            records += executor.map(_ingest_symbol, *tasks, chunksize=chunksize)
+
+    for record in records:
+        # symbols checked without a calendar are left out so the next run validates them again
+        if record['status'] != 'failed' and (record['symbol'] == 'SPY' or record['gaps'] is not None):
+            manifest[record['symbol']] = {k: v for k, v in record.items() if k not in ('symbol', 'status')}
+    _save_manifest(manifest_path, manifest)
+    if any(record['status'] == 'ingested' for record in records):
+        # drop anything this process still holds from before the refresh
+        data_store.price_cache.clear()
+        data_store.close_symbols()
+
+    report = pd.DataFrame(records).set_index('symbol')
+    return report.reindex(columns=['status', 'rows'] + ISSUES + ['error', 'version'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate symbol files and load them into the price store.")
+    parser.add_argument('--source', default=None, help="directory or http(s) URL to read <symbol>.csv files from (default: data folder)")
+    parser.add_argument('--data-folder', default="./data")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument('--force', action='store_true', help="process every file even if unchanged")
+    args = parser.parse_args(argv)
+
+    source = None
+    if args.source is not None:
+        source = HTTPSource(args.source) if re.match(r'https?://', args.source) else LocalSource(args.source)
+    report = ingest(source, data_folder=args.data_folder, max_workers=args.workers, force=args.force)
+    print(report['status'].value_counts().to_string())
+    flagged = report[(report[ISSUES].fillna(0) > 0).any(axis=1) | (report['status'] == 'failed')]
+    if len(flagged):
+        print(flagged[['status', 'rows'] + ISSUES + ['error']].to_string())
+    return 1 if (report['status'] == 'failed').any() else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+###########################################################
@@ -0,0 +1,159 @@
+import json
+import time
+import functools
+import tracemalloc
+from contextlib import nullcontext
+
+############### stage instrumentation ##################
+# Opt-in timing of the pipeline stages. Functions are wrapped with @timed and sub-phases with
+# `with stage(name):`. While disabled (the default) a wrapped call costs one flag check and
+# stage() returns a shared no-op context, so the hooks can stay in place permanently.
+#
+#   import instrument
+#   instrument.enable(track_memory=True)
+#   ... run a backtest ...
+#   instrument.export_json('profile.json')     # per-stage calls, wall time, memory
+#   instrument.export_trace('trace.json')      # Chrome trace events (chrome://tracing, Perfetto, speedscope)
+#   instrument.export_folded('stacks.txt')     # folded stacks for flamegraph.pl
+
+_enabled = False
+_track_memory = False
+_started_tracemalloc = False
+_stats = {}
+_events = []
+_stack = []
+_origin = 0.0
+_NULL = nullcontext()
+
+
+def enable(track_memory=False):
+    # track_memory uses tracemalloc, which slows Python allocations noticeably; timings are still recorded.
+    global _enabled, _track_memory, _origin, _started_tracemalloc
+    reset()
+    _enabled = True
+    _track_memory = track_memory
+    _origin = time.perf_counter()
+    if track_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracemalloc = True
+
+
+def disable():
+    # only stops tracemalloc if enable() started it, never a caller's own tracing
+    global _enabled, _started_tracemalloc
+    _enabled = False
+    if _started_tracemalloc and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _started_tracemalloc = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    _stats.clear()
+    _events.clear()
+    _stack.clear()
+
+
+class _Stage:
+    __slots__ = ('name', 'start', 'child_time', 'mem_start', 'mem_peak')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        if _track_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if _stack:
+                _stack[-1].mem_peak = max(_stack[-1].mem_peak, peak)
+            tracemalloc.reset_peak()
+            self.mem_start = self.mem_peak = current
+        self.child_time = 0.0
+        _stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        duration = end - self.start
+        _stack.pop()
+        net_bytes = peak_bytes = 0
+        if _track_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            self.mem_peak = max(self.mem_peak, peak)
+            net_bytes = current - self.mem_start
+            peak_bytes = self.mem_peak - self.mem_start
+        if _stack:
+            parent = _stack[-1]
+            parent.child_time += duration
+            if _track_memory:
+                parent.mem_peak = max(parent.mem_peak, self.mem_peak)
+
+        stats = _stats.get(self.name)
+        if stats is None:
+            stats = _stats[self.name] = {'calls': 0, 'total_s': 0.0, 'self_s': 0.0, 'max_s': 0.0,
+                                         'net_bytes': 0, 'peak_bytes': 0}
+        stats['calls'] += 1
+        stats['total_s'] += duration
+        stats['self_s'] += duration - self.child_time
+        stats['max_s'] = max(stats['max_s'], duration)
+        stats['net_bytes'] += net_bytes
+        stats['peak_bytes'] = max(stats['peak_bytes'], peak_bytes)
+        _events.append((';'.join([s.name for s in _stack] + [self.name]), self.start - _origin, duration,
+                        duration - self.child_time))
+        return False
+
+
+def stage(name):
+    if not _enabled:
+        return _NULL
+    return _Stage(name)
+
+
+def timed(name=None):
+    # Decorator recording every call of the function as a stage (named after the function by default).
+    def decorate(func):
+        stage_name = name or func.__module__ + '.' + func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Stage(stage_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def report():
+    # Per-stage totals, slowest first.
+    rows = sorted(_stats.items(), key=lambda item: item[1]['total_s'], reverse=True)
+    return {name: dict(stats, mean_s=stats['total_s'] / stats['calls']) for name, stats in rows}
+
+
+def export_json(path):
+    with open(path, 'w') as f:
+        json.dump({'track_memory': _track_memory, 'stages': report()}, f, indent=2)
+
+
+def export_trace(path):
+    # Chrome trace event format: one complete ('X') event per stage call, timestamps in microseconds.
+    events = [{'name': stack.rsplit(';', 1)[-1], 'cat': 'stage', 'ph': 'X', 'pid': 0, 'tid': 0,
+               'ts': start * 1e6, 'dur': duration * 1e6, 'args': {'stack': stack}}
+              for stack, start, duration, self_time in _events]
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+def export_folded(path):
+    # "outer;inner <self time in microseconds>" lines, the input format of flamegraph.pl and speedscope.
+    folded = {}
+    for stack, start, duration, self_time in _events:
+        folded[stack] = folded.get(stack, 0) + self_time
+    with open(path, 'w') as f:
+        for stack, self_time in folded.items():
+            f.write(f"{stack} {int(round(self_time * 1e6))}\n")
+
+###########################################################
@@ -0,0 +1,42 @@
+import os
+import numpy as np
+import matplotlib.pyplot as plt
+
+############### plotting helpers ##################
+# Shared by the main() functions and by report.py. Signal markers are drawn as one LineCollection
+# per side via vlines instead of one axvline artist per signal, which is what made long histories
+# with thousands of signals slow to draw.
+
+
+def signal_markers(ax, long_pos, short_pos):
+    # vertical dashed lines spanning the full height of the axes at every long (green) and short (red) date
+    transform = ax.get_xaxis_transform()
+    for dates, color in ((long_pos, 'green'), (short_pos, 'red')):
+        if len(dates):
+            ax.vlines(np.asarray(dates, dtype='datetime64[ns]'), 0, 1, transform=transform,
+                      colors=color, linestyles='--', linewidth=1)
+
+
+def plot_strategy(ax, strategy_DCR, baseline_DCR, long_pos=(), short_pos=(), label='My Strategy', title=None):
+    ax.plot(strategy_DCR, label=label, color='blue')
+    ax.plot(baseline_DCR, label='Baseline Strategy', color='orange')
+    signal_markers(ax, long_pos, short_pos)
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Cumulative Returns')
+    ax.set_title(title or label + ' vs Baseline Strategy - Cumulative Returns')
+    ax.legend()
+
+
+def finish(fig, name, out_folder=None):
+    # Show the figure interactively, or with out_folder write <out_folder>/<name>.png and close it
+    # so batch runs never block.
+    if out_folder is None:
+        plt.show()
+        return None
+    os.makedirs(out_folder, exist_ok=True)
+    path = os.path.join(out_folder, name + '.png')
+    fig.savefig(path)
+    plt.close(fig)
+    return path
+
+###########################################################
@@ -0,0 +1,145 @@
+import os
+import sys
+import html
+import math
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+from data_store import build_store, preload, read_range
+from backtester import assess_strategy
+from TechnicalStrategy import TechnicalStrategy
+from OracleStrategy import BaselineStrategy
+from plotting import plot_strategy
+
+############### batch reporting ##################
+# Headless reports for many symbols and date windows (e.g. walk-forward test folds). Every
+# (symbol, window) is backtested and charted in a process pool; charts are drawn on bare
+# matplotlib Figures, so no GUI backend or pyplot state is involved and nothing ever blocks.
+# Writes to out_folder:
+#   <symbol>_<start>_<end>.png   strategy vs baseline cumulative returns with the trade signals
+#   metrics.csv                  one row per chart
+#   index.html                   the metrics table with every chart inline
+#
+#   report(['DIS', 'AAPL'], [('2020-01-01', '2021-12-31')])
+#   python report.py --symbols DIS AAPL --start 2020-01-01 --end 2021-12-31
+#   python report.py --all --out reports/nightly                    # whole universe
+
+
+def _sharpe(ADR, SD):
+    return (ADR / SD) * math.sqrt(252) if SD else np.nan
+
+
+def _row(symbol, start, end):
+    return dict(symbol=symbol, start=pd.Timestamp(start).strftime('%Y-%m-%d'), end=pd.Timestamp(end).strftime('%Y-%m-%d'))
+
+
+def _check_symbols(symbols, first, last):
+    # Build the store entry of each symbol (and SPY) and read its prices once, so a missing or
+    # unreadable file fails here instead of in build_store/preload for the whole batch.
+    # Returns {symbol: error}; without a usable SPY every symbol fails.
+    errors = {}
+    for symbol in dict.fromkeys(['SPY'] + list(symbols)):
+        try:
+            build_store([symbol])
+            read_range(symbol, first, last)
+        except Exception as e:
+            errors[symbol] = f"{type(e).__name__}: {e}"
+    if 'SPY' in errors:
+        return {symbol: "SPY " + errors['SPY'] for symbol in symbols}
+    return errors
+
+
+def _render(task, params, out_folder, starting_value, fixed_cost, floating_cost, dpi):
+    symbol, (start, end) = task
+    row = _row(symbol, start, end)
+    start, end = row['start'], row['end']
+    try:
+        trades, long_pos, short_pos = TechnicalStrategy(**params).test(start, end, symbol, starting_value)
+        ADR, CR, SD, DCR = assess_strategy(trades, starting_value, fixed_cost, floating_cost, symbol=symbol)
+        b_ADR, b_CR, b_SD, b_DCR = assess_strategy(BaselineStrategy().test(start, end, symbol, starting_value),
+                                                   starting_value, fixed_cost, floating_cost, symbol=symbol)
+    except Exception as e:
+        row['error'] = f"{type(e).__name__}: {e}"
+        return row
+    row.update(sharpe=_sharpe(ADR, SD), cumulative_return=CR, average_daily_return=ADR, stdev_daily_return=SD,
+               baseline_sharpe=_sharpe(b_ADR, b_SD), baseline_cumulative_return=b_CR,
+               long_signals=len(long_pos), short_signals=len(short_pos))
+
+    fig = Figure(figsize=(10, 6))
+    plot_strategy(fig.add_subplot(), DCR, b_DCR, long_pos, short_pos, label='My Strategy',
+                  title=f"{symbol} {start} to {end}: My Strategy vs Baseline Strategy")
+    row['chart'] = f"{symbol}_{start}_{end}.png"
+    fig.savefig(os.path.join(out_folder, row['chart']), dpi=dpi)
+    return row
+
+
+def _write_html(path, metrics):
+    table = metrics.drop(columns='chart').to_html(index=False, float_format=lambda x: f"{x:.4f}", na_rep='')
+    charts = "\n".join(f'<h3>{html.escape(chart[:-4])}</h3>\n<img src="{html.escape(chart)}" loading="lazy">'
+                       for chart in metrics['chart'].dropna())
+    with open(path, 'w') as f:
+        f.write(f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>Strategy report</title></head><body>\n"
+                f"<h1>Strategy report</h1>\n{table}\n{charts}\n</body></html>\n")
+
+
+def report(symbols, windows, out_folder='./reports', params=None, starting_value=200000,
+           fixed_cost=9.95, floating_cost=0.005, dpi=100, max_workers=None):
+    # windows is a list of (start_date, end_date); for walk-forward folds pass
+    # [(test_start, test_end) for train_start, train_end, test_start, test_end in make_folds(...)].
+    # Returns the metrics frame, best Sharpe first. Failed runs keep their error and get no chart;
+    # a symbol whose file is missing or unreadable gets an error row for every window.
+    os.makedirs(out_folder, exist_ok=True)
+    args = (params or {}, out_folder, starting_value, fixed_cost, floating_cost, dpi)
+    first = min(pd.Timestamp(start) for start, end in windows)
+    last = max(pd.Timestamp(end) for start, end in windows)
+
+    errors = _check_symbols(symbols, first, last)
+    rows = [dict(_row(symbol, start, end), error=errors[symbol])
+            for symbol, (start, end) in itertools.product(symbols, windows) if symbol in errors]
+    symbols = [symbol for symbol in symbols if symbol not in errors]
+    tasks = list(itertools.product(symbols, windows))
+    if tasks and max_workers == 1:
+        preload(symbols, first, last)
+        rows += [_render(task, *args) for task in tasks]
+    elif tasks:
+        workers = max_workers or os.cpu_count() or 1
+        chunksize = max(1, len(tasks) // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers, initializer=preload, initargs=(symbols, first, last)) as executor:
+            rows += executor.map(_render, tasks, *(itertools.repeat(arg) for arg in args), chunksize=chunksize)
+
+    metrics = pd.DataFrame(rows).reindex(columns=['symbol', 'start', 'end', 'sharpe', 'cumulative_return',
+                                                  'average_daily_return', 'stdev_daily_return', 'baseline_sharpe',
+                                                  'baseline_cumulative_return', 'long_signals', 'short_signals',
+                                                  'chart', 'error'])
+    metrics = metrics.sort_values('sharpe', ascending=False, na_position='last').reset_index(drop=True)
+    metrics.to_csv(os.path.join(out_folder, 'metrics.csv'), index=False)
+    _write_html(os.path.join(out_folder, 'index.html'), metrics)
+    return metrics
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render strategy charts and metrics for many symbols without a display.")
+    parser.add_argument('--symbols', nargs='+', default=['DIS'])
+    parser.add_argument('--all', action='store_true', help="every symbol in data/ except SPY")
+    parser.add_argument('--start', default='2020-01-01')
+    parser.add_argument('--end', default='2021-12-31')
+    parser.add_argument('--out', default='./reports')
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    symbols = args.symbols
+    if args.all:
+        symbols = sorted(f[:-4] for f in os.listdir('./data') if f.endswith('.csv') and f != 'SPY.csv')
+    metrics = report(symbols, [(args.start, args.end)], args.out, max_workers=args.workers)
+    print(f"{metrics['chart'].notna().sum()} charts, {metrics['error'].notna().sum()} errors -> "
+          f"{os.path.join(args.out, 'index.html')}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+###########################################################
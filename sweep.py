@@ -0,0 +1,93 @@
+import os
+import math
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from data_store import build_store, preload
+from backtester import assess_strategy
+from TechnicalStrategy import TechnicalStrategy, DEFAULT_PARAMS, DECISION_PARAMS
+
+############### parameter sweep ##################
+# space maps TechnicalStrategy parameter names to lists of candidate values, e.g.
+#   {'signal_line': [1.5, 2.3, 3.0], 'rsi_upper': [80, 87], 'rsi_lower': [25, 32]}
+# Each combination is backtested on every (symbol, (start, end)) pair in a worker process.
+
+
+def grid_space(space):
+    keys = list(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys))]
+
+
+def random_space(space, n_samples, seed=None):
+    rng = np.random.default_rng(seed)
+    return [{k: space[k][rng.integers(len(space[k]))] for k in space} for _ in range(n_samples)]
+
+
+def _load_prices(symbols, windows):
+    # Runs once per worker: pull the full span of every symbol into the process-wide price
+    # cache from the memory-mapped store, so backtests never read from disk again.
+    preload(symbols, min(pd.Timestamp(w[0]) for w in windows), max(pd.Timestamp(w[1]) for w in windows))
+
+
+def _run_combination(params, symbols, windows, starting_value, fixed_cost, floating_cost, indicator_cache=False):
+    rows = []
+    strategy = TechnicalStrategy(**params, indicator_cache=indicator_cache)
+    for symbol in symbols:
+        for start_date, end_date in windows:
+            trades, long_pos, short_pos = strategy.test(start_date, end_date, symbol, starting_value)
+            ADR, CR, SD, DCR = assess_strategy(trades, starting_value, fixed_cost, floating_cost, symbol=symbol)
+            sharpe = (ADR / SD) * math.sqrt(252) if SD else np.nan
+            rows.append(dict(params, symbol=symbol, start_date=start_date, end_date=end_date,
+                             sharpe=sharpe, cumulative_return=CR, average_daily_return=ADR, stdev_daily_return=SD,
+                             trades=len(long_pos) + len(short_pos)))
+    return rows
+
+
+def sweep(space, symbols, windows, search='grid', n_samples=100, seed=None, metric='sharpe',
+          starting_value=200000, fixed_cost=9.95, floating_cost=0.005, max_workers=None, indicator_cache=False):
+    # Returns (ranked, results): ranked has one row per parameter combination with metrics averaged
+    # over all symbols and windows, best first; results has one row per individual backtest.
+    # indicator_cache=True makes every backtest read RSI/MACD from the on-disk indicator cache, so each
+    # (symbol, window) is computed once instead of once per combination.
+    unknown = [k for k in space if k not in DEFAULT_PARAMS]
+    if unknown:
+        raise ValueError("unknown parameters: " + ", ".join(unknown))
+    unused = [k for k in space if k not in DECISION_PARAMS]
+    if unused:
+        raise ValueError("parameters not used by any decision, sweeping them has no effect: " + ", ".join(unused))
+    if search == 'grid':
+        combinations = grid_space(space)
+    elif search == 'random':
+        combinations = random_space(space, n_samples, seed)
+    else:
+        raise ValueError("search must be 'grid' or 'random'")
+    if metric not in ('sharpe', 'cumulative_return'):
+        raise ValueError("metric must be 'sharpe' or 'cumulative_return'")
+
+    # convert any new or changed CSVs up front so workers only ever map the store read-only
+    build_store(list(symbols) + ['SPY'])
+
+    rows = []
+    if max_workers == 1:
+        _load_prices(symbols, windows)
+        for params in combinations:
+            rows.extend(_run_combination(params, symbols, windows, starting_value, fixed_cost, floating_cost,
+                                         indicator_cache))
+    else:
+        workers = max_workers or os.cpu_count() or 1
+        chunksize = max(1, len(combinations) // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_load_prices, initargs=(symbols, windows)) as executor:
+            for result in executor.map(_run_combination, combinations, itertools.repeat(symbols), itertools.repeat(windows),
+                                       itertools.repeat(starting_value), itertools.repeat(fixed_cost),
+                                       itertools.repeat(floating_cost), itertools.repeat(indicator_cache),
+                                       chunksize=chunksize):
+                rows.extend(result)
+
+    results = pd.DataFrame(rows)
+    keys = list(space)
+    ranked = results.groupby(keys, sort=False)[['sharpe', 'cumulative_return', 'average_daily_return', 'stdev_daily_return']].mean()
+    ranked = ranked.sort_values(metric, ascending=False).reset_index()
+    return ranked, results
+
+###########################################################
@@ -1,26 +1,19 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.lines import Line2D
+from data_store import get_data
 import math
+import copy
+from collections import deque
+from instrument import timed
+from plotting import finish
 
-def get_data(start, end, symbols, column_name="Adj Close", include_spy=True, data_folder="./data"):
-    dates = pd.date_range(start, end)
-    df1 = pd.DataFrame(index=dates)
-    df2 = pd.read_csv('data/SPY.csv', index_col='Date', parse_dates=True, usecols=['Date', column_name])
-    df2.rename(columns={column_name: "SPY"}, inplace=True)
-    df1 = df1.join(df2, how='inner')
-    for symbol in symbols:
-        tmp_df = pd.read_csv(data_folder + '/'+ symbol + ".csv", index_col='Date', parse_dates=True, usecols=['Date', column_name])
-        tmp_df.rename(columns={column_name: symbol}, inplace=True)
-        df1 = df1.join(tmp_df, how='left', rsuffix='_'+symbol)
-    if (not include_spy):
-        df1.drop('SPY', axis=1, inplace=True)
-    return df1
-
+@timed()
 def simple_moving_average(data, window=20):
     return data.rolling(window=window).mean()
 
 
+@timed()
 def bollinger_bands(data, window=9, num_std=2):
     sma = simple_moving_average(data, window=window)
     rolling_std = data.rolling(window=window).std()
@@ -38,22 +31,27 @@ def bollinger_bands(data, window=9, num_std=2):
 
     return result_df
 
-def relative_strength_index(data):
+@timed()
+def wilder_smoothing(data, period=14):
+    # Seed with the simple mean of the first `period` values, then
+    # avg[i] = (avg[i - 1] * (period - 1) + data[i]) / period, which is an adjust=False EWM with alpha = 1/period.
+    # Works column-wise on a DataFrame, so many symbols are smoothed in one call.
+    seeded = data.astype('float64')
+    seeded.iloc[:period] = float('nan')
+    if len(data) >= period:
+        seeded.iloc[period - 1:period] = data.iloc[:period].rolling(window=period).mean().iloc[period - 1:].values
+    return seeded.ewm(alpha=1 / period, adjust=False).mean()
+
+
+@timed()
+def relative_strength_index(data, period=14):
     price_diff = data.diff(1)
     gain = price_diff.where(price_diff > 0, 0)
     loss = -price_diff.where(price_diff < 0, 0)
 
-    avg_gain = gain.rolling(window=14).mean()
-    avg_loss = loss.rolling(window=14).mean()
-
-    # Initial RSI calculation (step one) using the first 14 days
-    rs = avg_gain / avg_loss
-    rsi_step_one = 100 - (100 / (1 + rs))
-
-    # Smoothing step (step two)
-    for i in range(14, len(rsi_step_one)):
-        avg_gain.iloc[i] = (avg_gain.iloc[i - 1] * 13 + gain.iloc[i]) / 14
-        avg_loss.iloc[i] = (avg_loss.iloc[i - 1] * 13 + loss.iloc[i]) / 14
+    # Wilder smoothing: simple average over the first period, recursive average afterwards
+    avg_gain = wilder_smoothing(gain, period)
+    avg_loss = wilder_smoothing(loss, period)
 
     rs_smoothed = avg_gain / avg_loss
     rsi = 100 - (100 / (1 + rs_smoothed))
@@ -61,30 +59,159 @@ def relative_strength_index(data):
     return rsi
 
 
-def macd(data):
+@timed()
+def macd(data, symbol='DIS'):
     df = data.copy()
-    df['EMA-12'] = df['DIS'].ewm(12).mean()
-    df['EMA-26'] = df['DIS'].ewm(26).mean()
+    df['EMA-12'] = df[symbol].ewm(12).mean()
+    df['EMA-26'] = df[symbol].ewm(26).mean()
     df['MACD'] = df['EMA-12'] - df['EMA-26']
     return df
 
 
 
-def main():
+@timed()
+def compute_indicators(prices, sma_window=20, bb_window=9, num_std=2, rsi_period=14):
+    # Batch engine: prices is a date x symbol DataFrame (any number of columns). Every indicator is
+    # computed for all symbols at once and returned as a dict of date x symbol DataFrames.
+    # Rolling means are computed once per window, so when sma_window == bb_window the SMA and the
+    # Bollinger middle band are the same object.
+    prices = prices.astype('float64')
+    rolling_means = {}
+
+    def rolling_mean(window):
+        if window not in rolling_means:
+            rolling_means[window] = prices.rolling(window=window).mean()
+        return rolling_means[window]
+
+    bollinger_band = rolling_mean(bb_window)
+    rolling_std = prices.rolling(window=bb_window).std()
+    ema_12 = prices.ewm(12).mean()
+    ema_26 = prices.ewm(26).mean()
+
+    return {
+        'SMA': rolling_mean(sma_window),
+        'Bollinger Band': bollinger_band,
+        'Upper Band': bollinger_band + (rolling_std * num_std),
+        'Lower Band': bollinger_band - (rolling_std * num_std),
+        'RSI': relative_strength_index(prices, period=rsi_period),
+        'EMA-12': ema_12,
+        'EMA-26': ema_26,
+        'MACD': ema_12 - ema_26,
+    }
+
+
+############### streaming indicators ##################
+# Stateful versions of the indicators above for live daily bars. Each update() consumes one price
+# and returns the indicator value for that bar in O(1) with respect to the history length, matching
+# what the batch function would report for the same bar. snapshot()/restore() round-trip the state.
+
+class StreamIndicator:
+    def snapshot(self):
+        return copy.deepcopy(self.__dict__)
+
+    def restore(self, state):
+        self.__dict__.update(copy.deepcopy(state))
+        return self
+
+
+class SMAStream(StreamIndicator):
+    def __init__(self, window=20):
+        self.window = window
+        self.values = deque(maxlen=window)
+
+    def update(self, price):
+        self.values.append(price)
+        if len(self.values) < self.window or any(math.isnan(v) for v in self.values):
+            return float('nan')
+        return math.fsum(self.values) / self.window
+
+
+class BollingerStream(StreamIndicator):
+    def __init__(self, window=9, num_std=2):
+        self.num_std = num_std
+        self.sma = SMAStream(window)
+
+    def update(self, price):
+        # returns (upper band, lower band, bollinger band)
+        middle = self.sma.update(price)
+        if math.isnan(middle):
+            return float('nan'), float('nan'), middle
+        window = self.sma.window
+        rolling_std = math.sqrt(math.fsum((v - middle) ** 2 for v in self.sma.values) / (window - 1)) if window > 1 else float('nan')
+        return middle + (rolling_std * self.num_std), middle - (rolling_std * self.num_std), middle
+
+
+class EMAStream(StreamIndicator):
+    # Same weighting as pandas ewm(com).mean() with adjust=True: a running weighted sum and weight total.
+    def __init__(self, com):
+        self.decay = 1 - 1 / (1 + com)
+        self.weighted_sum = 0.0
+        self.weight = 0.0
+
+    def update(self, price):
+        self.weighted_sum *= self.decay
+        self.weight *= self.decay
+        if not math.isnan(price):
+            self.weighted_sum += price
+            self.weight += 1.0
+        return self.weighted_sum / self.weight if self.weight > 0 else float('nan')
+
+
+class RSIStream(StreamIndicator):
+    def __init__(self, period=14):
+        self.period = period
+        self.prev_price = float('nan')
+        self.count = 0
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+
+    def update(self, price):
+        # the first bar has no previous price, which the batch version also counts as a zero change
+        price_diff = price - self.prev_price
+        self.prev_price = price
+        gain = price_diff if price_diff > 0 else 0.0
+        loss = -price_diff if price_diff < 0 else 0.0
+        self.count += 1
+        if self.count < self.period:
+            self.avg_gain += gain
+            self.avg_loss += loss
+            return float('nan')
+        if self.count == self.period:
+            self.avg_gain = (self.avg_gain + gain) / self.period
+            self.avg_loss = (self.avg_loss + loss) / self.period
+        else:
+            self.avg_gain = (self.avg_gain * (self.period - 1) + gain) / self.period
+            self.avg_loss = (self.avg_loss * (self.period - 1) + loss) / self.period
+        if self.avg_loss == 0:
+            return float('nan') if self.avg_gain == 0 else 100.0
+        return 100 - (100 / (1 + self.avg_gain / self.avg_loss))
+
+
+class MACDStream(StreamIndicator):
+    def __init__(self):
+        self.ema_12 = EMAStream(12)
+        self.ema_26 = EMAStream(26)
+
+    def update(self, price):
+        return self.ema_12.update(price) - self.ema_26.update(price)
+
+
+def main(out_folder=None):
+    # out_folder writes each chart there as a PNG instead of opening a window
     data = get_data('2018-01-01', '2019-12-31', ['DIS'])
 
     sma_data = simple_moving_average(data, window=20)
-    plt.figure(figsize=(10, 6))
+    fig = plt.figure(figsize=(10, 6))
     plt.plot(data['DIS'], label='DIS Stock Price', color='blue')
     plt.plot(sma_data['DIS'], label='20-Day SMA', color='red')
     plt.xlabel('Date')
     plt.ylabel('Price')
     plt.title('DIS Stock Price with 20-Day SMA')
     plt.legend()
-    plt.show()
+    finish(fig, 'DIS_SMA', out_folder)
 
     bollinger_data = bollinger_bands(data['DIS'], window=9, num_std=2)  
-    plt.figure(figsize=(10, 6))
+    fig = plt.figure(figsize=(10, 6))
     plt.plot(data['DIS'], label='DIS Stock Price', color='blue')
     plt.plot(bollinger_data['Bollinger Band'], label='Bollinger Band (9-Day SMA)', color='red')
     plt.plot(bollinger_data['Upper Band'], label='Upper Band', color='green', linestyle='--')
@@ -93,7 +220,7 @@ def main():
     plt.ylabel('Price')
     plt.title('DIS Stock Price and Bollinger Bands')
     plt.legend()
-    plt.show()
+    finish(fig, 'DIS_Bollinger', out_folder)
 
     rsi_data = relative_strength_index(data)
     fig, ax1 = plt.subplots(figsize=(10, 6))
@@ -108,7 +235,7 @@ def main():
     ax2.plot(data['DIS'], label='Stock Price', color='blue')
     ax2.set_ylabel('Stock Price', color='blue')
     ax2.legend(loc='upper right')
-    plt.show()
+    finish(fig, 'DIS_RSI', out_folder)
 
     data = macd(data) # buy when macd goes positive
     fig, ax1 = plt.subplots(figsize=(10, 6))
@@ -121,7 +248,7 @@ def main():
     ax2.set_ylabel('MACD', color='red')
     ax2.tick_params('y', colors='red')
     plt.title('DIS Stock Price with MACD')
-    plt.show()
+    finish(fig, 'DIS_MACD', out_folder)
 
 
 
@@ -0,0 +1,125 @@
+import os
+import sys
+import math
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+from data_store import get_data
+from backtester import aggregate_orders, assess_strategy, calculate_info, calculate_info_many, portfolio_values
+from TechnicalStrategy import TechnicalStrategy
+from OracleStrategy import OracleStrategy, BaselineStrategy
+
+WINDOWS = [('2018-01-01', '2019-12-31'), ('2020-01-01', '2021-12-31')]
+FEES = [(9.95, 0.005), (0, 0)]
+
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    # data/ and cache/ are relative paths
+    monkeypatch.chdir(ROOT)
+
+
+def reference_values(shares, prices, starting_value, fixed_cost, floating_cost):
+    # The per-row loop assess_strategy used before portfolio_values, for a single symbol.
+    cash = starting_value
+    current_shares = 0
+    portfolio_value = []
+    for trade, price in zip(shares, prices):
+        stock_value = abs(trade * price)
+        if not math.isnan(stock_value):
+            if trade > 0:
+                fee = fixed_cost + (floating_cost * stock_value)
+                cash -= fee
+                cash -= stock_value
+                current_shares += trade
+            if trade < 0:
+                fee = fixed_cost + (floating_cost * stock_value)
+                cash -= fee
+                cash += stock_value
+                current_shares += trade
+        portfolio_value.append(cash + (current_shares * price))
+    return np.array(portfolio_value)
+
+
+def reference_assess(trades, starting_value, fixed_cost, floating_cost, symbol='DIS'):
+    prices = get_data(trades.index[0], trades.index[-1], [symbol], include_spy=False).loc[trades.index, symbol]
+    values = reference_values(trades['Trade'].to_numpy(dtype=np.float64), prices.to_numpy(), starting_value, fixed_cost, floating_cost)
+    SR, ADR, CR, SD, final, DCR = calculate_info(pd.DataFrame({"Portfolio Price": values}, index=trades.index))
+    return ADR, CR, SD, DCR
+
+
+def strategy_trades(name, start, end):
+    if name == 'technical':
+        return TechnicalStrategy(indicator_cache=False).test(start, end)[0]
+    if name == 'oracle':
+        return OracleStrategy().test(start, end)    # NaN trade on the last day
+    return BaselineStrategy().test(start, end)
+
+
+@pytest.mark.parametrize('strategy', ['technical', 'oracle', 'baseline'])
+@pytest.mark.parametrize('start,end', WINDOWS)
+@pytest.mark.parametrize('fixed_cost,floating_cost', FEES)
+def test_assess_strategy_matches_loop(strategy, start, end, fixed_cost, floating_cost):
+    trades = strategy_trades(strategy, start, end)
+    ADR, CR, SD, DCR = assess_strategy(trades, 200000, fixed_cost, floating_cost)
+    r_ADR, r_CR, r_SD, r_DCR = reference_assess(trades, 200000, fixed_cost, floating_cost)
+    assert ADR == pytest.approx(r_ADR, rel=1e-12, abs=1e-15)
+    assert CR == pytest.approx(r_CR, rel=1e-12, abs=1e-15)
+    assert SD == pytest.approx(r_SD, rel=1e-12, abs=1e-15)
+    np.testing.assert_allclose(DCR.to_numpy(), r_DCR.to_numpy(), rtol=1e-12, atol=1e-15)
+
+
+@pytest.mark.parametrize('start,end', WINDOWS)
+@pytest.mark.parametrize('fixed_cost,floating_cost', FEES)
+def test_portfolio_values_matches_loop(start, end, fixed_cost, floating_cost):
+    trades = strategy_trades('technical', start, end)
+    prices = get_data(start, end, ['DIS'], include_spy=False).loc[trades.index, 'DIS'].to_numpy()
+    shares = trades['Trade'].to_numpy(dtype=np.float64)
+    values, holdings, cash = portfolio_values(shares[:, None], prices[:, None], 200000, fixed_cost, floating_cost)
+    np.testing.assert_allclose(values, reference_values(shares, prices, 200000, fixed_cost, floating_cost), rtol=1e-12)
+    np.testing.assert_array_equal(holdings[:, 0], np.cumsum(shares))
+
+
+@pytest.mark.parametrize('fixed_cost,floating_cost', FEES)
+def test_portfolio_values_nan_trade_and_price(fixed_cost, floating_cost):
+    # a NaN trade and a trade on a day without a price are both skipped; a NaN price while
+    # holding makes that day's value NaN, as in the loop
+    shares = np.array([1000, 0, np.nan, -2000, 0, 2000, 2000, 0])
+    prices = np.array([10.0, 10.5, 11.0, 12.0, np.nan, 11.5, np.nan, 12.5])
+    values, holdings, cash = portfolio_values(shares[:, None], prices[:, None], 200000, fixed_cost, floating_cost)
+    expected = reference_values(shares, prices, 200000, fixed_cost, floating_cost)
+    np.testing.assert_allclose(values, expected, rtol=1e-12)
+    assert np.isnan(values[4]) and np.isnan(values[6]) and holdings[-1, 0] == 1000
+
+
+def test_portfolio_values_flat_day_without_price_is_cash():
+    # deliberate difference from the loop: flat and unpriced is worth the cash, not NaN
+    shares = np.array([0, 0, 1000])
+    prices = np.array([10.0, np.nan, 11.0])
+    values, holdings, cash = portfolio_values(shares[:, None], prices[:, None], 200000, 9.95, 0.005)
+    assert np.isnan(reference_values(shares, prices, 200000, 9.95, 0.005)[1])
+    assert values[1] == 200000
+    np.testing.assert_allclose(values[[0, 2]], reference_values(shares, prices, 200000, 9.95, 0.005)[[0, 2]])
+
+
+@pytest.mark.filterwarnings("ignore:The default fill_method:FutureWarning")
+def test_calculate_info_many_matches_calculate_info_with_nan():
+    # a missing value mid-column is forward-filled the way pct_change() does it
+    values = get_data('2018-01-01', '2019-12-31', ['DIS', 'AAPL'], include_spy=False) * 1000
+    values.iloc[[100, 250, 251], 0] = np.nan
+    many = calculate_info_many(values)
+    for column in values.columns:
+        SR, ADR, CR, SD, final, DCR = calculate_info(values[[column]])
+        np.testing.assert_allclose(many.loc[column, ['sharpe_ratio', 'average_daily_return', 'cumulative_return',
+                                                     'stdev_daily_return', 'end_value']].to_numpy(dtype=np.float64),
+                                   [SR, ADR, CR, SD, final], rtol=1e-12)
+
+
+def test_aggregate_orders_rejects_unknown_directions():
+    orders = pd.DataFrame({'Date': ['2019-01-02'] * 3, 'Symbol': ['DIS'] * 3,
+                           'Direction': [' buy', 'SHORT', 'Cover'], 'Shares': [100, 100, 100]})
+    with pytest.raises(ValueError, match="Cover, SHORT"):
+        aggregate_orders(orders)
@@ -0,0 +1,20 @@
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+from ingest import _load_manifest, _save_manifest
+
+
+def test_manifest_round_trip_in_current_directory(tmp_path, monkeypatch):
+    # a bare file name has no directory part to create
+    monkeypatch.chdir(tmp_path)
+    _save_manifest('manifest.json', {'DIS': {'version': '1:2'}})
+    assert _load_manifest('manifest.json') == {'DIS': {'version': '1:2'}}
+    assert os.listdir(tmp_path) == ['manifest.json']
+
+
+def test_manifest_creates_missing_folders(tmp_path):
+    path = os.path.join(tmp_path, 'cache', 'ingest', 'manifest.json')
+    _save_manifest(path, {})
+    assert _load_manifest(path) == {}
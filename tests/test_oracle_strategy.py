@@ -0,0 +1,75 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+from data_store import get_data
+from OracleStrategy import OracleStrategy
+
+SYMBOLS = ['DIS', 'AAPL', 'XOM']
+WINDOWS = [('2008-01-01', '2012-12-31'), ('2018-01-01', '2019-12-31'), ('2020-01-01', '2021-12-31')]
+
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    monkeypatch.chdir(ROOT)
+
+
+def reference_test(start_date, end_date, symbol):
+    # OracleStrategy.test as it was before vectorization: iterrows over the next-day diff.
+    dates = pd.date_range(start=start_date, end=end_date)
+    df_trades = pd.DataFrame(index=dates)
+    df_stock = get_data(start_date, end_date, [symbol], include_spy=False)
+    df_trades = df_trades.join(df_stock, how='inner')
+    df_trades = df_trades.rename(columns={symbol: "Trade"})
+    df_trades = df_trades.diff().shift(-1)
+
+    shares_held = 0
+    for index, row in df_trades.iterrows():
+        diff = row['Trade']
+        if diff > 0:
+            if shares_held > 0:
+                diff = 0
+            if shares_held < 0:
+                diff = 2000
+                shares_held += diff
+            if shares_held == 0:
+                diff = 1000
+                shares_held += diff
+        elif diff < 0:
+            if shares_held < 0:
+                diff = 0
+            if shares_held > 0:
+                diff = -2000
+                shares_held += diff
+            if shares_held == 0:
+                diff = -1000
+                shares_held += diff
+        df_trades.at[index, 'Trade'] = diff
+    return df_trades
+
+
+@pytest.mark.parametrize('symbol', SYMBOLS)
+@pytest.mark.parametrize('start,end', WINDOWS)
+def test_matches_reference_loop(symbol, start, end):
+    trades = OracleStrategy().test(start, end, symbol)
+    expected = reference_test(start, end, symbol)
+    assert trades.index.equals(expected.index)
+    # the last day has no next-day move in either version
+    assert np.isnan(trades['Trade'].iloc[-1]) and np.isnan(expected['Trade'].iloc[-1])
+    np.testing.assert_array_equal(trades['Trade'].to_numpy(), expected['Trade'].to_numpy())
+
+
+@pytest.mark.parametrize('start,end', WINDOWS)
+def test_many_matches_reference_loop_per_symbol(start, end):
+    # FB only lists in 2012, so in the first window its column starts with a run of NaN prices
+    symbols = SYMBOLS + ['FB']
+    trades = OracleStrategy().test_many(start, end, symbols)
+    assert list(trades.columns) == symbols
+    for symbol in symbols:
+        expected = reference_test(start, end, symbol)
+        assert trades.index.equals(expected.index)
+        np.testing.assert_array_equal(trades[symbol].to_numpy(), expected['Trade'].to_numpy())
@@ -0,0 +1,26 @@
+import os
+import sys
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+from report import report
+
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    monkeypatch.chdir(ROOT)
+
+
+@pytest.mark.filterwarnings("ignore::FutureWarning")
+def test_unknown_symbol_gets_error_rows(tmp_path):
+    windows = [('2019-01-01', '2019-12-31'), ('2020-01-01', '2020-12-31')]
+    metrics = report(['DIS', 'NOPE'], windows, out_folder=str(tmp_path), max_workers=1)
+    assert len(metrics) == 4
+    bad = metrics[metrics['symbol'] == 'NOPE']
+    assert sorted(bad['start']) == ['2019-01-01', '2020-01-01']
+    assert bad['error'].str.startswith('FileNotFoundError').all() and bad['chart'].isna().all()
+    good = metrics[metrics['symbol'] == 'DIS']
+    assert good['error'].isna().all() and good['sharpe'].notna().all()
+    assert all(os.path.exists(os.path.join(tmp_path, chart)) for chart in good['chart'])
+    assert os.path.exists(os.path.join(tmp_path, 'index.html'))
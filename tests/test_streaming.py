@@ -0,0 +1,91 @@
+import os
+import sys
+import pickle
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+from data_store import get_data
+from tech_ind import (simple_moving_average, bollinger_bands, relative_strength_index, macd,
+                      SMAStream, BollingerStream, EMAStream, RSIStream, MACDStream)
+from TechnicalStrategy import TechnicalStrategy, StreamingTechnicalStrategy
+
+WINDOWS = [('2008-01-01', '2012-12-31'), ('2018-01-01', '2019-12-31'), ('2020-01-01', '2021-12-31')]
+
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    monkeypatch.chdir(ROOT)
+
+
+def prices(start='2018-01-01', end='2019-12-31', symbol='DIS'):
+    return get_data(start, end, [symbol], include_spy=False)[symbol]
+
+
+def replay(stream, values, restore_at=None):
+    # Feed values bar by bar; at restore_at the state is pickled and the rest of the replay continues
+    # on a fresh object restored from it.
+    out = []
+    for i, value in enumerate(values):
+        if i == restore_at:
+            state = pickle.loads(pickle.dumps(stream.snapshot()))
+            stream = type(stream).__new__(type(stream)).restore(state)
+        out.append(stream.update(value))
+    return out
+
+
+@pytest.mark.parametrize('start,end', WINDOWS)
+@pytest.mark.parametrize('params', [{}, {'signal_line': 1.5, 'rsi_upper': 80, 'rsi_lower': 25}])
+def test_streaming_strategy_matches_test(start, end, params):
+    trades, long_pos, short_pos = TechnicalStrategy(**params).test(start, end, 'DIS')
+    streamed = StreamingTechnicalStrategy(**params).run(prices(start, end))
+    assert streamed.index.equals(trades.index)
+    assert streamed['Trade'].tolist() == trades['Trade'].tolist()
+
+
+def test_streaming_strategy_snapshot_restore():
+    series = prices()
+    expected = StreamingTechnicalStrategy().run(series)['Trade'].tolist()
+    for restore_at in (1, 30, len(series) // 2, len(series) - 1):
+        assert replay(StreamingTechnicalStrategy(), series.to_numpy(), restore_at) == expected
+
+
+@pytest.mark.parametrize('restore_at', [None, 5, 250])
+def test_sma_stream(restore_at):
+    series = prices()
+    expected = simple_moving_average(series, window=20).to_numpy()
+    np.testing.assert_allclose(replay(SMAStream(20), series.to_numpy(), restore_at), expected, rtol=1e-12)
+
+
+@pytest.mark.parametrize('restore_at', [None, 5, 250])
+def test_bollinger_stream(restore_at):
+    series = prices()
+    expected = bollinger_bands(series, window=9, num_std=2)
+    streamed = pd.DataFrame(replay(BollingerStream(9, 2), series.to_numpy(), restore_at),
+                            columns=['Upper Band', 'Lower Band', 'Bollinger Band'])
+    np.testing.assert_allclose(streamed.to_numpy(), expected[streamed.columns].to_numpy(), rtol=1e-9)
+
+
+@pytest.mark.parametrize('restore_at', [None, 5, 250])
+def test_ema_stream(restore_at):
+    series = prices()
+    for com in (12, 26):
+        expected = series.ewm(com).mean().to_numpy()
+        np.testing.assert_allclose(replay(EMAStream(com), series.to_numpy(), restore_at), expected, rtol=1e-9)
+
+
+@pytest.mark.parametrize('restore_at', [None, 5, 250])
+def test_rsi_stream(restore_at):
+    series = prices()
+    expected = relative_strength_index(series, period=14).to_numpy()
+    np.testing.assert_allclose(replay(RSIStream(14), series.to_numpy(), restore_at), expected, rtol=1e-9)
+
+
+@pytest.mark.parametrize('restore_at', [None, 5, 250])
+def test_macd_stream(restore_at):
+    data = get_data('2018-01-01', '2019-12-31', ['DIS'], include_spy=False)
+    expected = macd(data, 'DIS')['MACD'].to_numpy()
+    np.testing.assert_allclose(replay(MACDStream(), data['DIS'].to_numpy(), restore_at), expected,
+                               rtol=1e-9, atol=1e-12)
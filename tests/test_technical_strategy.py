@@ -0,0 +1,107 @@
+import os
+import sys
+import pandas as pd
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+from data_store import get_data
+from tech_ind import relative_strength_index, macd
+from TechnicalStrategy import TechnicalStrategy, DEFAULT_PARAMS
+
+WINDOWS = [('2008-01-01', '2012-12-31'), ('2018-01-01', '2019-12-31'), ('2020-01-01', '2021-12-31')]
+PARAMS = [{}, {'signal_line': 1.5, 'rsi_upper': 80, 'rsi_lower': 25}]
+
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    monkeypatch.chdir(ROOT)
+
+
+def reference_test(start_date, end_date, symbol, params):
+    # TechnicalStrategy.test as it was before vectorization: iterrows over the indicators and a
+    # per-day position state machine.
+    params = dict(DEFAULT_PARAMS, **params)
+    data = get_data(start_date, end_date, [symbol], include_spy=False)
+    df_trades = pd.DataFrame(index=data.index, columns=['Trade'])
+    df_decisions = pd.DataFrame(index=data.index, columns=['MACD', 'RSI', 'Bollinger'])
+    rsi_data = relative_strength_index(data)
+    macd_data = macd(data, symbol)
+
+    prev_macd = None
+    signal_line = params['signal_line']
+    for date, row in macd_data.iterrows():
+        curr_macd = macd_data.loc[date, 'MACD']
+        if prev_macd is None:
+            prev_macd = curr_macd
+            continue
+        if prev_macd < signal_line and curr_macd > signal_line:
+            df_decisions.loc[date, 'MACD'] = 1
+        elif prev_macd > signal_line and curr_macd < signal_line:
+            df_decisions.loc[date, 'MACD'] = -1
+        else:
+            df_decisions.loc[date, 'MACD'] = 0
+        prev_macd = curr_macd
+
+    for date, row in rsi_data.iterrows():
+        if row[symbol] > params['rsi_upper']:
+            df_decisions.loc[date, 'RSI'] = -1
+        elif row[symbol] < params['rsi_lower']:
+            df_decisions.loc[date, 'RSI'] = 1
+        else:
+            df_decisions.loc[date, 'RSI'] = 0
+
+    long_positions = []
+    short_positions = []
+    shares_held = 0
+    for date, row in df_decisions.iterrows():
+        verdict = row['MACD'] + row['RSI']
+        if verdict > 0:
+            if shares_held > 0:
+                df_trades.loc[date] = 0
+            elif shares_held == 0:
+                df_trades.loc[date] = 1000
+                long_positions.append(date)
+            elif shares_held < 0:
+                df_trades.loc[date] = 2000
+                long_positions.append(date)
+            shares_held = 1000
+        elif verdict < 0:
+            if shares_held > 0:
+                df_trades.loc[date] = -2000
+                short_positions.append(date)
+            elif shares_held == 0:
+                df_trades.loc[date] = -1000
+                short_positions.append(date)
+            elif shares_held < 0:
+                df_trades.loc[date] = 0
+            shares_held = -1000
+        else:
+            df_trades.loc[date] = 0
+    return df_trades, long_positions, short_positions
+
+
+@pytest.mark.parametrize('symbol', ['DIS', 'AAPL', 'XOM'])
+@pytest.mark.parametrize('start,end', WINDOWS)
+@pytest.mark.parametrize('params', PARAMS)
+def test_matches_reference_loop(symbol, start, end, params):
+    trades, long_pos, short_pos = TechnicalStrategy(**params).test(start, end, symbol)
+    r_trades, r_long, r_short = reference_test(start, end, symbol, params)
+    assert trades.index.equals(r_trades.index)
+    assert trades['Trade'].tolist() == r_trades['Trade'].astype(int).tolist()
+    assert long_pos == r_long
+    assert short_pos == r_short
+
+
+def test_sweep_and_walk_forward_with_indicator_cache():
+    from sweep import sweep
+    from walk_forward import walk_forward
+    space = {'signal_line': [1.5, 2.3], 'rsi_upper': [80, 87]}
+    windows = [('2018-01-01', '2019-12-31')]
+    plain = sweep(space, ['DIS'], windows, max_workers=1)[1]
+    cached = sweep(space, ['DIS'], windows, max_workers=1, indicator_cache=True)[1]
+    pd.testing.assert_frame_equal(plain, cached)
+
+    plain = walk_forward(['DIS'], '2018-01-01', '2021-12-31', space=space, max_workers=1)[0]
+    cached = walk_forward(['DIS'], '2018-01-01', '2021-12-31', space=space, max_workers=1, indicator_cache=True)[0]
+    pd.testing.assert_frame_equal(plain, cached)
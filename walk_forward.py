@@ -0,0 +1,84 @@
+import os
+import math
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from data_store import build_store, get_data, preload
+from backtester import assess_strategy
+from TechnicalStrategy import TechnicalStrategy
+
+############### walk-forward evaluation ##################
+# The SPY trading calendar between start_date and end_date is cut into folds of train_days
+# in-sample days followed by test_days out-of-sample days, advancing by step_days (all counted
+# in trading days). For every (symbol, fold) the strategy is trained on the in-sample window and
+# tested on the next one. Folds run in a process pool; each worker loads the price matrix for
+# all symbols once and every get_data call after that is served from memory.
+
+
+def make_folds(start_date, end_date, train_days, test_days, step_days=None):
+    calendar = get_data(start_date, end_date, []).index
+    step_days = step_days or test_days
+    folds = []
+    for first in range(0, len(calendar) - train_days - test_days + 1, step_days):
+        train = calendar[first:first + train_days]
+        test = calendar[first + train_days:first + train_days + test_days]
+        folds.append((train[0], train[-1], test[0], test[-1]))
+    return folds
+
+
+def _sharpe(ADR, SD):
+    return (ADR / SD) * math.sqrt(252) if SD else np.nan
+
+
+def _run_fold(task, params, space, metric, starting_value, fixed_cost, floating_cost, indicator_cache=False):
+    symbol, fold_number, (train_start, train_end, test_start, test_end) = task
+    strategy = TechnicalStrategy(**params, indicator_cache=indicator_cache)
+    chosen = strategy.train(train_start, train_end, symbol, starting_value, space=space, metric=metric, max_workers=1,
+                            fixed_cost=fixed_cost, floating_cost=floating_cost, indicator_cache=indicator_cache)
+
+    row = dict(symbol=symbol, fold=fold_number, train_start=train_start, train_end=train_end,
+               test_start=test_start, test_end=test_end, **chosen)
+    for sample, (start, end) in (('in_sample', (train_start, train_end)), ('out_of_sample', (test_start, test_end))):
+        trades, long_pos, short_pos = strategy.test(start, end, symbol, starting_value)
+        ADR, CR, SD, DCR = assess_strategy(trades, starting_value, fixed_cost, floating_cost, symbol=symbol)
+        row[sample + '_sharpe'] = _sharpe(ADR, SD)
+        row[sample + '_cumulative_return'] = CR
+        row[sample + '_average_daily_return'] = ADR
+        row[sample + '_stdev_daily_return'] = SD
+    return row
+
+
+def walk_forward(symbols, start_date, end_date, train_days=504, test_days=126, step_days=None,
+                 space=None, metric='sharpe', params=None, starting_value=200000,
+                 fixed_cost=9.95, floating_cost=0.005, max_workers=None, indicator_cache=False):
+    # Returns (folds, summary): one row per (symbol, fold), and out-of-sample metrics aggregated
+    # per symbol plus an 'ALL' row across every fold. Without a search space train() is a no-op
+    # and the strategy runs with params (or its defaults) on every fold. indicator_cache=True reads
+    # RSI/MACD from the on-disk indicator cache in train() and test().
+    folds = make_folds(start_date, end_date, train_days, test_days, step_days)
+    if not folds:
+        raise ValueError("date range is shorter than one train + test window")
+    tasks = [(symbol, i, fold) for symbol in symbols for i, fold in enumerate(folds)]
+    args = (params or {}, space, metric, starting_value, fixed_cost, floating_cost, indicator_cache)
+
+    build_store(list(symbols) + ['SPY'])
+    if max_workers == 1:
+        preload(symbols, start_date, end_date)
+        rows = [_run_fold(task, *args) for task in tasks]
+    else:
+        workers = max_workers or os.cpu_count() or 1
+        chunksize = max(1, len(tasks) // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers, initializer=preload, initargs=(symbols, start_date, end_date)) as executor:
+            rows = list(executor.map(_run_fold, tasks, *(itertools.repeat(arg) for arg in args), chunksize=chunksize))
+
+    results = pd.DataFrame(rows)
+    results['out_of_sample_profitable'] = results['out_of_sample_cumulative_return'] > 0
+    metrics = ['out_of_sample_sharpe', 'out_of_sample_cumulative_return', 'out_of_sample_profitable',
+               'in_sample_sharpe', 'in_sample_cumulative_return']
+    stats = ['mean', 'std', 'min', 'max']
+    summary = pd.concat([results.groupby('symbol')[metrics].agg(stats),
+                         results.assign(symbol='ALL').groupby('symbol')[metrics].agg(stats)])
+    return results, summary
+
+###########################################################